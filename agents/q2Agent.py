@@ -6,7 +6,6 @@ import util
 from game import Actions, Agent, Directions
 from logs.search_logger import log_function
 from pacman import GameState
-from util import manhattanDistance
 
 import math
 def scoreEvaluationFunction(currentGameState):
@@ -24,29 +23,29 @@ def betterEvaluationFunction(currentGameState):
     Your extreme ghost-hunting, pellet-nabbing, food-gobbling, unstoppable
     evaluation function.
     """
-    # Get current position and food
+    # Get current position and food; distances are true maze distances
     pos = currentGameState.getPacmanPosition()
-    food = currentGameState.getFood()
-    food_list = food.asList()
+    distance = currentGameState.getMazeDistances().getDistance
+    food_positions = currentGameState.getFoodPositions()
     capsules = currentGameState.getCapsules()  # Get power pellets
     
     # Get ghost positions and states
     ghost_states = currentGameState.getGhostStates()
     
     # Calculate distance to closest food
-    if food_list:
-        min_food_dist = min(manhattanDistance(pos, food) for food in food_list)
+    if food_positions:
+        min_food_dist = min(distance(pos, food) for food in food_positions)
         # Consider average distance to all food for future planning
-        avg_food_dist = sum(manhattanDistance(pos, food) for food in food_list) / len(food_list)
+        avg_food_dist = sum(distance(pos, food) for food in food_positions) / len(food_positions)
     else:
         min_food_dist = 0
         avg_food_dist = 0
     
     # Calculate distance to closest capsule (power pellet)
     if capsules:
-        min_capsule_dist = min(manhattanDistance(pos, capsule) for capsule in capsules)
+        min_capsule_dist = min(distance(pos, capsule) for capsule in capsules)
         # Consider average distance to all capsules
-        avg_capsule_dist = sum(manhattanDistance(pos, capsule) for capsule in capsules) / len(capsules)
+        avg_capsule_dist = sum(distance(pos, capsule) for capsule in capsules) / len(capsules)
     else:
         min_capsule_dist = 0
         avg_capsule_dist = 0
@@ -55,7 +54,7 @@ def betterEvaluationFunction(currentGameState):
     min_ghost_dist = float('inf')
     ghost_scared = False
     for ghost in ghost_states:
-        ghost_dist = manhattanDistance(pos, ghost.getPosition())
+        ghost_dist = distance(pos, util.nearestPoint(ghost.getPosition()))
         if ghost_dist < min_ghost_dist:
             min_ghost_dist = ghost_dist
         if ghost.scaredTimer > 0:
@@ -89,6 +88,12 @@ def betterEvaluationFunction(currentGameState):
             # When ghosts are far away, reduce their impact on decision making
             score -= 10.0 / (min_ghost_dist + 1)
     
+    # Trap risk: inside a dead end with a ghost near enough to reach its
+    # entrance before Pacman can get out
+    dead_end_depth = currentGameState.getLayoutAnalysis().getDeadEndDepth(pos)
+    if not ghost_scared and dead_end_depth and min_ghost_dist <= 2 * dead_end_depth:
+        score -= 200.0
+
     # Additional survival bonus (reduced to encourage food collection)
     if not currentGameState.isLose():
         score += 50  # Reduced survival bonus to encourage food collection
@@ -106,6 +111,7 @@ class Q2_Agent(Agent):
         self.depth = int(depth)
         self.start_time = None
         self.time_limit = 29  # Leave 1 seconds buffer for safety
+        self.deadline = None  # Per-move util.Deadline, when the game provides one
         
         # Add position history tracking
         self.position_history = []  # Track recent positions
@@ -142,13 +148,25 @@ class Q2_Agent(Agent):
             
         return False
 
+    def setDeadline(self, deadline):
+        """
+        Called by the game before each move (see game.Agent); the search runs
+        until this deadline instead of its own time_limit for the game.
+        """
+        self.deadline = deadline
+
     @log_function
     def getAction(self, gameState: GameState):
         """
-        Returns the minimax action using alpha-beta pruning with adaptive depth
+        Returns the minimax action using alpha-beta pruning with adaptive depth,
+        searched by iterative deepening so that a best action is always ready
         """
         if self.start_time is None:
             self.start_time = time.time()
+        deadline = self.deadline
+        if deadline is None:
+            deadline = util.Deadline(self.time_limit - (time.time() - self.start_time))
+        self.deadline = None
 
         # Update position history
         current_pos = gameState.getPacmanPosition()
@@ -164,18 +182,17 @@ class Q2_Agent(Agent):
 
         def minimax(state, depth, agentIndex, alpha, beta):
             # Check time limit
-            if time.time() - self.start_time > self.time_limit:
+            if deadline.expired():
                 # If time limit reached, return best immediate action
-                legal_actions = state.getLegalActions(agentIndex)
-                if not legal_actions:
+                children = state.generateSuccessors(agentIndex)
+                if not children:
                     return self.evaluationFunction(state), Directions.STOP
                 
                 # For Pacman, choose action that maximizes immediate evaluation
                 if agentIndex == 0:
                     best_value = float('-inf')
                     best_action = Directions.STOP
-                    for action in legal_actions:
-                        successor = state.generateSuccessor(agentIndex, action)
+                    for action, successor in children:
                         value = self.evaluationFunction(successor)
                         if value > best_value:
                             best_value = value
@@ -185,8 +202,7 @@ class Q2_Agent(Agent):
                 else:
                     best_value = float('inf')
                     best_action = Directions.STOP
-                    for action in legal_actions:
-                        successor = state.generateSuccessor(agentIndex, action)
+                    for action, successor in children:
                         value = self.evaluationFunction(successor)
                         if value < best_value:
                             best_value = value
@@ -197,27 +213,23 @@ class Q2_Agent(Agent):
             if state.isWin() or state.isLose() or depth == 0:
                 return self.evaluationFunction(state), Directions.STOP
             
-            # Get legal actions
-            legal_actions = state.getLegalActions(agentIndex)
-            if not legal_actions:
+            # Expand every legal action once, without STOP if there are other
+            # options; the successors are reused below
+            children = state.generateSuccessors(agentIndex, noStop=True)
+            if not children:
                 return self.evaluationFunction(state), Directions.STOP
             
-            # Remove STOP action if there are other options
-            if Directions.STOP in legal_actions and len(legal_actions) > 1:
-                legal_actions.remove(Directions.STOP)
-            
             # Action ordering for Pacman
             if agentIndex == 0:
                 # Pre-evaluate actions and sort by score
                 action_scores = []
-                for action in legal_actions:
-                    successor = state.generateSuccessor(agentIndex, action)
+                for action, successor in children:
                     score = self.evaluationFunction(successor)
-                    action_scores.append((action, score))
+                    action_scores.append((action, successor, score))
                 
                 # Sort actions by score and limit branches
-                action_scores.sort(key=lambda x: x[1], reverse=True)
-                legal_actions = [a for a, _ in action_scores[:self.max_branches]]
+                action_scores.sort(key=lambda x: x[2], reverse=True)
+                children = [(a, s) for a, s, _ in action_scores[:self.max_branches]]
             
             # Initialize best action
             best_action = Directions.STOP
@@ -225,8 +237,7 @@ class Q2_Agent(Agent):
             # Pacman is maximizer (agent 0)
             if agentIndex == 0:
                 value = float('-inf')
-                for action in legal_actions:
-                    successor = state.generateSuccessor(agentIndex, action)
+                for action, successor in children:
                     successor_value, _ = minimax(successor, depth - 1, 1, alpha, beta)
                     
                     # Apply oscillation penalty
@@ -248,8 +259,7 @@ class Q2_Agent(Agent):
             else:
                 value = float('inf')
                 next_agent = (agentIndex + 1) % state.getNumAgents()
-                for action in legal_actions:
-                    successor = state.generateSuccessor(agentIndex, action)
+                for action, successor in children:
                     successor_value, _ = minimax(successor, depth - 1, next_agent, alpha, beta)
                     
                     if successor_value < value:
@@ -263,7 +273,7 @@ class Q2_Agent(Agent):
 
         # Adaptive depth based on game state
         num_agents = gameState.getNumAgents()
-        num_food = len(gameState.getFood().asList())
+        num_food = gameState.getNumFood()
         
         # Adjust depth based on game state
         if self.detect_oscillation():
@@ -275,6 +285,13 @@ class Q2_Agent(Agent):
         else:  # Many food dots
             search_depth = num_agents  # Minimal depth for most of the game
 
-        # Start minimax search with adaptive depth
-        _, best_action = minimax(gameState, search_depth, 0, float('-inf'), float('inf'))
+        # Deepen up to the adaptive depth; past the deadline minimax only looks
+        # one move ahead, so a cut-short iteration is dropped for the last
+        # complete one
+        best_action = None
+        for depth in range(1, search_depth + 1):
+            _, action = minimax(gameState, depth, 0, float('-inf'), float('inf'))
+            if best_action is not None and deadline.expired():
+                break
+            best_action = deadline.bestAction = action
         return best_action
\ No newline at end of file
@@ -0,0 +1,749 @@
+"""
+Micro-benchmarks for the data structures and engine paths that dominate the
+search and adversarial agents.
+
+USAGE:      python benchmark.py <benchmark> [<benchmark> ...] <options>
+EXAMPLES:   python benchmark.py priorityQueue
+            python benchmark.py all --repeat 5
+"""
+import random
+import sys
+import time
+from optparse import OptionParser
+
+import util
+
+
+def timeit(function, repeat):
+    """
+    Runs function() repeat times and returns the best wall time in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def printTable(header, rows):
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    line = ' | '.join('%%-%ds' % w for w in widths)
+    print(line % tuple(header))
+    print('-+-'.join('-' * w for w in widths))
+    for row in rows:
+        print(line % tuple(row))
+    print()
+
+
+def benchPriorityQueue(options):
+    """
+    Compares util.PriorityQueue against util.IndexedPriorityQueue: a queue of
+    n entries receives 1000 decrease-key updates and is then drained.
+    """
+    sizes = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+    numUpdates = 1000
+    rows = []
+    for n in sizes:
+        rng = random.Random(n)
+        priorities = [rng.randint(0, n) for _ in range(n)]
+        updates = [(rng.randrange(n), rng.randint(-n, 0)) for _ in range(numUpdates)]
+
+        results = []
+        for queueClass in [util.PriorityQueue, util.IndexedPriorityQueue]:
+            if queueClass is util.PriorityQueue and n > options.maxLinear:
+                results.append(None)
+                continue
+            queue = queueClass()
+            for item, priority in enumerate(priorities):
+                queue.push(item, priority)
+
+            def updateAll():
+                for item, priority in updates:
+                    queue.update(item, priority)
+            updateTime = timeit(updateAll, 1)
+
+            def drain():
+                while not queue.isEmpty():
+                    queue.pop()
+            popTime = timeit(drain, 1)
+            results.append((updateTime, popTime))
+
+        row = [n]
+        for result in results:
+            if result is None:
+                row += ['skipped', 'skipped']
+            else:
+                row += ['%.2f' % (result[0] / numUpdates * 1e6), '%.2f' % (result[1] / n * 1e6)]
+        rows.append(row)
+
+    print('Priority queue: %d updates on a queue of n entries, then drain' % numUpdates)
+    printTable(['n', 'PQ update us', 'PQ pop us', 'IPQ update us', 'IPQ pop us'], rows)
+
+
+class ListQueue(util.Queue):
+    "The original list-backed util.Queue, kept as a baseline."
+    def __init__(self):
+        self.list = []
+
+    def push(self, item):
+        self.list.insert(0, item)
+
+
+def largestLayouts(count):
+    """
+    Returns the names of the count largest layouts by area.
+    """
+    import glob
+    import os
+
+    from layout import getLayout
+    layouts = []
+    for filename in glob.glob('layouts/*.lay'):
+        name = os.path.basename(filename)
+        layout = getLayout(name)
+        layouts.append((layout.width * layout.height, name, layout))
+    layouts.sort(key=lambda entry: (-entry[0], entry[1]))
+    return [(name, layout) for _, name, layout in layouts[:count]]
+
+
+def tupleBfs(start, walls, queueClass):
+    queue = queueClass()
+    queue.push(start)
+    visited = set([start])
+    while not queue.isEmpty():
+        x, y = queue.pop()
+        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+            next_pos = (x + dx, y + dy)
+            if not walls[next_pos[0]][next_pos[1]] and next_pos not in visited:
+                queue.push(next_pos)
+                visited.add(next_pos)
+    return len(visited)
+
+
+def benchBfs(options):
+    """
+    BFS throughput in cells/second from Pacman's start on the largest layouts,
+    for the list-backed queue, the deque-backed util.Queue and the cell-id
+    ring buffer frontier.
+    """
+    from solvers.q1b_solver import grid_bfs
+
+    rows = []
+    for name, layout in largestLayouts(6):
+        start = [pos for isPacman, pos in layout.agentPositions if isPacman][0]
+        walls = layout.walls
+        numCells = tupleBfs(start, walls, util.Queue)
+        row = [name, numCells]
+        for run in [lambda: tupleBfs(start, walls, ListQueue),
+                    lambda: tupleBfs(start, walls, util.Queue),
+                    lambda: sum(1 for _ in grid_bfs(start, walls))]:
+            row.append('%.0f' % (numCells / timeit(run, options.repeat)))
+        rows.append(row)
+
+    print('BFS throughput (cells/second)')
+    printTable(['layout', 'cells', 'list Queue', 'deque Queue', 'RingQueue'], rows)
+
+
+def initialState(layoutName):
+    """
+    Returns the starting pacman.GameState for a layout.
+    """
+    from layout import getLayout
+    from pacman import GameState
+    state = GameState()
+    state.initialize(getLayout(layoutName))
+    return state
+
+
+def benchAstarFrontier(options):
+    """
+    q1a A* expansions per second with util.PriorityQueue against
+    util.BucketQueue (FIFO and LIFO tie-breaking).
+    """
+    from problems.q1a_problem import q1a_problem
+    from solvers import q1a_solver
+
+    frontiers = [('PriorityQueue', util.PriorityQueue),
+                 ('BucketQueue', util.BucketQueue),
+                 ('BucketQueue lifo', lambda: util.BucketQueue(lifo=True))]
+    rows = []
+    for layoutName in ['q1a_bigMaze', 'q1a_bigMaze2', 'q1a_openMaze']:
+        problem = q1a_problem(initialState(layoutName))
+        row = [layoutName]
+        for _, frontierType in frontiers:
+            expansions = [0]
+
+            def search():
+                astarData = q1a_solver.astar_initialise(problem, frontierType)
+                expansions[0] = 0
+                terminate = False
+                while not terminate:
+                    expansions[0] += 1
+                    terminate, _ = q1a_solver.astar_loop_body(problem, astarData)
+            best = timeit(search, options.repeat)
+            row.append('%d @ %.0f/s' % (expansions[0], expansions[0] / best))
+        rows.append(row)
+
+    print('q1a A* frontier: expansions @ expansions/second')
+    printTable(['layout'] + [name for name, _ in frontiers], rows)
+
+
+def randomPlayout(state, rng, maxSteps):
+    """
+    Plays uniformly random moves for every agent from state until the game
+    ends or maxSteps successors have been generated.  Returns the number of
+    successors generated.
+    """
+    steps = 0
+    while steps < maxSteps and not (state.isWin() or state.isLose()):
+        agentIndex = steps % state.getNumAgents()
+        state = state.generateSuccessor(agentIndex, rng.choice(state.getLegalActions(agentIndex)))
+        steps += 1
+    return steps
+
+
+def benchSuccessors(options):
+    """
+    GameState.generateSuccessor throughput along random playouts with the
+    food stored as a list-of-lists Grid and as a BitGrid.
+    """
+    from game import GameStateData
+
+    rows = []
+    for layoutName in ['q2_mediumClassic', 'q2_originalClassic', 'q2_contestClassic']:
+        row = [layoutName]
+        for bitboardFood in [False, True]:
+            GameStateData.bitboardFood = bitboardFood
+            start = initialState(layoutName)
+            steps = [0]
+
+            def playouts():
+                rng = random.Random(0)
+                steps[0] = sum(randomPlayout(start, rng, 2000) for _ in range(10))
+            elapsed = timeit(playouts, options.repeat)
+            row.append('%.0f' % (steps[0] / elapsed))
+        rows.append(row)
+    GameStateData.bitboardFood = True
+
+    print('generateSuccessor throughput (successors/second)')
+    printTable(['layout', 'Grid food', 'BitGrid food'], rows)
+
+
+def playGame(layoutName, pacman='Q2_Agent', ghost='RandomGhost', timeout=30, seed='cs188'):
+    """
+    Plays one headless game the way pacman.py -q -f does and returns the Game.
+    """
+    import textDisplay
+    from layout import getLayout
+    from pacman import ClassicGameRules
+
+    random.seed(seed)
+    layout = getLayout(layoutName)
+    pacmanAgent = util.import_by_name('./agents', pacman)()
+    ghostType = util.import_by_name('./agents', ghost)
+    ghosts = [ghostType(i + 1) for i in range(layout.getNumGhosts())]
+    rules = ClassicGameRules(timeout)
+    game = rules.newGame(layout, pacmanAgent, ghosts, textDisplay.NullGraphics(), True, False)
+    game.run()
+    return game
+
+
+def benchFoodMemory(options):
+    """
+    Memory allocated per pellet eaten by each way of updating the food grid,
+    and tracemalloc figures for a full q2_originalClassic game.
+    """
+    import tracemalloc
+
+    from game import BitGrid, GameStateData
+
+    food = initialState('q2_originalClassic').data.food.toGrid()
+    x, y = food.asList()[0]
+
+    def fullCopy():
+        g = food.copy()
+        g[x][y] = False
+        return g
+
+    bitFood = BitGrid.fromGrid(food)
+    updates = [('Grid copy + write (old consume)', fullCopy),
+               ('Grid.copyWith', lambda: food.copyWith(x, y, False)),
+               ('BitGrid.copyWith', lambda: bitFood.copyWith(x, y, False))]
+    rows = []
+    for name, update in updates:
+        tracemalloc.start()
+        kept = update()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        rows.append([name, size])
+    print('Bytes allocated per pellet eaten on q2_originalClassic (%dx%d)' % (food.width, food.height))
+    printTable(['food update', 'bytes'], rows)
+
+    rows = []
+    for bitboardFood in [False, True]:
+        GameStateData.bitboardFood = bitboardFood
+        tracemalloc.start()
+        start = time.perf_counter()
+        game = playGame('q2_originalClassic')
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rows.append(['BitGrid' if bitboardFood else 'Grid', len(game.moveHistory), game.state.getScore(),
+                     '%.1f' % (current / 2 ** 20), '%.1f' % (peak / 2 ** 20), '%.1f' % elapsed])
+    GameStateData.bitboardFood = True
+    print('Full q2_originalClassic game under tracemalloc')
+    printTable(['food', 'moves', 'score', 'current MiB', 'peak MiB', 'seconds'], rows)
+
+
+def benchStateSize(options):
+    """
+    Successors per second and bytes per successor state on q2_contestClassic.
+    """
+    import tracemalloc
+
+    layoutName = 'q2_contestClassic'
+    start = initialState(layoutName)
+    steps = [0]
+
+    def playouts():
+        rng = random.Random(0)
+        steps[0] = sum(randomPlayout(start, rng, 2000) for _ in range(10))
+    elapsed = timeit(playouts, options.repeat)
+
+    numStates = 2000
+    rng = random.Random(0)
+    tracemalloc.start()
+    states = []
+    state = start
+    while len(states) < numStates:
+        if state.isWin() or state.isLose():
+            state = start
+        agentIndex = len(states) % state.getNumAgents()
+        state = state.generateSuccessor(agentIndex, rng.choice(state.getLegalActions(agentIndex)))
+        states.append(state)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print('GameState cost on %s (%d agents)' % (layoutName, start.getNumAgents()))
+    printTable(['successors/second', 'bytes/state'], [['%.0f' % (steps[0] / elapsed), '%.0f' % (size / numStates)]])
+
+
+def benchExplored(options):
+    """
+    Time and peak memory of a full q2_originalClassic game under each
+    GameState explored-tracking mode.
+    """
+    import tracemalloc
+
+    from pacman import GameState
+
+    rows = []
+    for mode in GameState.EXPLORED_MODES:
+        GameState.setExploredMode(mode)
+        start = time.perf_counter()
+        game = playGame('q2_originalClassic')
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        GameState.setExploredMode(mode)
+        playGame('q2_originalClassic')
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        stats = GameState.getExploredStats()
+        rows.append([str(mode), len(game.moveHistory), stats['generated'], str(stats['distinct']),
+                     '%.2f' % elapsed, '%.1f' % (peak / 2 ** 20)])
+    GameState.setExploredMode(None)
+
+    print('Full q2_originalClassic game by explored-tracking mode')
+    printTable(['mode', 'moves', 'generated', 'distinct', 'seconds', 'peak MiB'], rows)
+
+
+def benchLegalMoves(options):
+    """
+    Legal-move generation by wall probing (Actions.getPossibleActions) against
+    the layout's MoveTable over every open cell and direction, and random
+    playouts with and without the legality re-check in generateSuccessor.
+    """
+    from game import Actions, Configuration, Directions
+    from pacman import GameState
+
+    directions = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+    rows = []
+    for layoutName in ['q2_mediumClassic', 'q2_originalClassic', 'q2_contestClassic']:
+        start = initialState(layoutName)
+        walls, table = start.getWalls(), start.getMoveTable()
+        configs = [Configuration((x, y), direction) for x, y in walls.asList(False)
+                   for direction in directions]
+        for config in configs:
+            if table.getPossibleActions(config) != Actions.getPossibleActions(config, walls):
+                raise Exception('MoveTable mismatch on %s at %s' % (layoutName, config))
+
+        def probe():
+            for config in configs:
+                Actions.getPossibleActions(config, walls)
+
+        def lookup():
+            for config in configs:
+                table.getPossibleActions(config)
+        row = [layoutName]
+        for function in [probe, lookup]:
+            row.append('%.0f' % (len(configs) / timeit(function, options.repeat)))
+
+        for trusted in [False, True]:
+            steps = [0]
+
+            def playouts():
+                rng = random.Random(0)
+                steps[0] = 0
+                for _ in range(10):
+                    state = start
+                    while not (state.isWin() or state.isLose()) and steps[0] < 20000:
+                        for agentIndex in range(state.getNumAgents()):
+                            action = rng.choice(state.getLegalActions(agentIndex))
+                            state = state.generateSuccessor(agentIndex, action, trusted)
+                            steps[0] += 1
+                            if state.isWin() or state.isLose():
+                                break
+            elapsed = timeit(playouts, options.repeat)
+            row.append('%.0f' % (steps[0] / elapsed))
+        rows.append(row)
+
+    print('Legal moves per second, and successors per second on random playouts')
+    printTable(['layout', 'wall probes', 'MoveTable', 'checked', 'trusted'], rows)
+
+
+def benchSearch(options):
+    """
+    Q2_Agent search speed on q2_mediumClassic: runs a fresh agent's getAction
+    on Pacman's turns along seeded random playouts, and reports the
+    successors the search generated and the nodes it expanded per second.
+    """
+    from pacman import GameState
+
+    agentType = util.import_by_name('./agents', 'Q2_Agent')
+    rows = []
+    for seed in range(3):
+        rng = random.Random(seed)
+        positions = []
+        while len(positions) < 300:
+            state = initialState('q2_mediumClassic')
+            while not (state.isWin() or state.isLose()):
+                agentIndex = state.data._agentMoved
+                agentIndex = 0 if agentIndex is None else (agentIndex + 1) % state.getNumAgents()
+                if agentIndex == 0 and rng.random() < 0.2:
+                    positions.append(state)
+                state = state.generateSuccessor(agentIndex, rng.choice(state.getLegalActions(agentIndex)))
+
+        counts = [0]
+
+        def search():
+            GameState.setExploredMode('count')
+            for position in positions:
+                agentType().getAction(position)
+            counts[0] = GameState.getExploredStats()['generated']
+            GameState.setExploredMode(None)
+        elapsed = timeit(search, options.repeat)
+        rows.append([seed, len(positions), counts[0], '%.1f' % (elapsed / len(positions) * 1000),
+                     '%.0f' % (counts[0] / elapsed)])
+
+    print('Q2_Agent.getAction on q2_mediumClassic positions')
+    printTable(['seed', 'positions', 'successors', 'ms/decision', 'successors/s'], rows)
+
+
+def benchObservation(options):
+    """
+    Cost of the per-turn state copy Game.run hands to agents: a full deepCopy
+    (copying the layout) against observationCopy, and whole headless games
+    with each.
+    """
+    from game import Game
+
+    rows = []
+    for layoutName in ['q2_mediumClassic', 'q2_originalClassic', 'q2_contestClassic']:
+        state = initialState(layoutName)
+        row = [layoutName]
+        for copy in [state.deepCopy, state.observationCopy]:
+            row.append('%.1f' % (timeit(lambda: [copy() for _ in range(1000)], options.repeat) * 1000))
+        for deepCopyObservations in [True, False]:
+            Game.deepCopyObservations = deepCopyObservations
+            row.append('%.2f' % timeit(lambda: playGame(layoutName, 'GreedyAgent', timeout=300),
+                                       options.repeat))
+        rows.append(row)
+    Game.deepCopyObservations = False
+
+    print('us per copy, and seconds per game (GreedyAgent vs RandomGhost)')
+    printTable(['layout', 'deepCopy', 'observationCopy', 'game deepCopy', 'game observation'], rows)
+
+
+def stateSignature(state):
+    "Everything applyMove/undoMove must reproduce, in comparable form"
+    data = state.data
+    agents = tuple((s.configuration.pos, s.configuration.direction, s.scaredTimer) for s in data.agentStates)
+    return (agents, data.food.asList(), data.numFood, data.foodPositions, tuple(data.capsules), data.score,
+            data.scoreChange, data.zobrist, data._win, data._lose, tuple(data._eaten), data._foodEaten,
+            data._capsuleEaten, data._agentMoved)
+
+
+def checkMoveApi(layoutName, numGames, seed):
+    """
+    Differential check of GameState.applyMove/undoMove against
+    generateSuccessor: plays random games on one state in place next to a
+    chain of copied successors, randomly backtracking a few moves, and fails
+    with an exception on the first state where they disagree (checked even
+    under python -O).  Returns the number of moves made.
+    """
+    from pacman import GameState
+
+    rng = random.Random(seed)
+    start = initialState(layoutName)
+    numMoves = 0
+    for game in range(numGames):
+        walker = GameState(start)
+        history = [(None, start)]   # (undo token, reference state) per ply
+        while len(history) < 500:
+            reference = history[-1][1]
+            if reference.isWin() or reference.isLose() or (len(history) > 1 and rng.random() < 0.1):
+                for _ in range(rng.randint(1, min(5, len(history) - 1))):
+                    token, _ = history.pop()
+                    walker.undoMove(token)
+                    if stateSignature(walker) != stateSignature(history[-1][1]):
+                        raise Exception('undoMove mismatch on %s, game %d' % (layoutName, game))
+                if reference.isWin() or reference.isLose():
+                    break
+                continue
+            agentIndex = (len(history) - 1) % reference.getNumAgents()
+            action = rng.choice(reference.getLegalActions(agentIndex))
+            successor = reference.generateSuccessor(agentIndex, action)
+            token = walker.applyMove(agentIndex, action)
+            if stateSignature(walker) != stateSignature(successor):
+                raise Exception('applyMove mismatch on %s, game %d, ply %d' % (layoutName, game, len(history)))
+            history.append((token, successor))
+            numMoves += 1
+    return numMoves
+
+
+def benchMoveApi(options):
+    """
+    Checks applyMove/undoMove against generateSuccessor on random games, then
+    compares full-width tree walks of both APIs in nodes per second.
+    """
+    rows = []
+    for layoutName in ['q2_smallClassic', 'q2_mediumClassic', 'q2_capsuleClassic', 'q2_originalClassic']:
+        rows.append([layoutName, checkMoveApi(layoutName, 20, 0)])
+    print('applyMove/undoMove differential check: all states identical')
+    printTable(['layout', 'moves checked'], rows)
+
+    def copyWalk(state, depth, agentIndex):
+        if depth == 0 or state.isWin() or state.isLose():
+            return 1
+        nextAgent = (agentIndex + 1) % state.getNumAgents()
+        return 1 + sum(copyWalk(state.generateSuccessor(agentIndex, action), depth - 1, nextAgent)
+                       for action in state.getLegalActions(agentIndex))
+
+    def inPlaceWalk(state, depth, agentIndex):
+        if depth == 0 or state.isWin() or state.isLose():
+            return 1
+        nextAgent = (agentIndex + 1) % state.getNumAgents()
+        nodes = 1
+        for action in state.getLegalActions(agentIndex):
+            token = state.applyMove(agentIndex, action)
+            nodes += inPlaceWalk(state, depth - 1, nextAgent)
+            state.undoMove(token)
+        return nodes
+
+    rows = []
+    for layoutName, depth in [('q2_mediumClassic', 9), ('q2_originalClassic', 10)]:
+        start = initialState(layoutName)
+        row = [layoutName, depth]
+        for walk in [copyWalk, inPlaceWalk]:
+            nodes = [0]
+
+            def run():
+                nodes[0] = walk(start, depth, 0)
+            elapsed = timeit(run, options.repeat)
+            row.append('%d @ %.0f/s' % (nodes[0], nodes[0] / elapsed))
+        rows.append(row)
+    print('Full-width tree walk: nodes @ nodes/second')
+    printTable(['layout', 'depth', 'generateSuccessor', 'applyMove/undoMove'], rows)
+
+
+def benchLayoutLoading(options):
+    """
+    Cost of getting a layout: parsing the .lay text, loading the compiled
+    form from layouts/__pycache__, a memoized getLayout (a copy of the layout
+    parsed earlier in the process), and Layout.deepCopy.
+    """
+    import layout
+
+    rows = []
+    for layoutName in ['q1a_bigMaze', 'q1c_bigSearch', 'q2_contestClassic', 'q2_originalClassic']:
+        path = 'layouts/%s.lay' % layoutName
+        with open(path) as f:
+            text = [line.strip() for line in f]
+        loaded = layout.getLayout(layoutName)
+        row = [layoutName]
+        for load in [lambda: layout.Layout(text), lambda: layout.loadCompiledLayout(path),
+                     lambda: layout.getLayout(layoutName), loaded.deepCopy]:
+            row.append('%.1f' % (timeit(lambda: [load() for _ in range(100)], options.repeat) * 10000))
+        rows.append(row)
+
+    print('us per layout')
+    printTable(['layout', 'parse', 'compiled', 'getLayout', 'deepCopy'], rows)
+
+
+def benchMazeDistances(options):
+    """
+    mazeDistances.MazeDistances on the largest layouts: the all-pairs
+    breadth-first searches, loading the saved matrix, and the cost of a
+    distance query next to a Manhattan distance and a breadth-first search
+    per query (q1c_solver's old find_path_to_food).
+    """
+    import mazeDistances
+    from solvers.q1b_solver import grid_bfs
+
+    rows = []
+    for name, layout in largestLayouts(4):
+        walls = layout.walls
+        built = mazeDistances.MazeDistances(walls, cacheDirectory=None)
+        rng = random.Random(0)
+        pairs = [(rng.choice(built.cells), rng.choice(built.cells)) for _ in range(1000)]
+        loaded = mazeDistances.getMazeDistances(walls)
+        row = [name, built.size,
+               '%.3f' % timeit(lambda: mazeDistances.MazeDistances(walls, cacheDirectory=None), options.repeat),
+               '%.2f' % (timeit(lambda: mazeDistances.MazeDistances(walls), options.repeat) * 1000)]
+        for query in [util.manhattanDistance, loaded.getDistance]:
+            row.append('%.2f' % (timeit(lambda: [query(a, b) for a, b in pairs], options.repeat) * 1000))
+
+        def bfsDistances():
+            for a, b in pairs[:100]:
+                goal = walls.cellId(*b)
+                for cell in grid_bfs(a, walls):
+                    if cell == goal: break
+        row.append('%.2f' % (timeit(bfsDistances, options.repeat) * 10000))
+        rows.append(row)
+
+    print('seconds to build, ms to load from layouts/__pycache__, and us per query')
+    printTable(['layout', 'cells', 'build', 'load', 'manhattan', 'maze', 'bfs'], rows)
+
+
+def benchCorridors(options):
+    """
+    Size of the corridor graph (corridorGraph.py) against the cell graph on
+    maze layouts, the time to build it, and the node expansions of
+    q1a_solver over q1a_problem and over corridor_problem.
+    """
+    import contextlib
+    import io
+    import re
+
+    from corridorGraph import CorridorGraph
+    from problems.corridor_problem import corridor_problem
+    from problems.q1a_problem import q1a_problem
+    from solvers.q1a_solver import q1a_solver
+
+    rows = []
+    for layoutName in ['q1a_tinyMaze', 'q1a_smallMaze', 'q1a_mediumMaze', 'q1a_bigMaze', 'q1a_openMaze']:
+        state = initialState(layoutName)
+        walls = state.getWalls()
+        graph = CorridorGraph(walls, state.getFood(), [state.getPacmanPosition()] + state.getFood().asList())
+        row = [layoutName, len(state.data.layout.openCells), len(graph.nodes), graph.getNumEdges(),
+               '%.2f' % (timeit(lambda: CorridorGraph(walls), options.repeat) * 1000)]
+        for problemType in [q1a_problem, corridor_problem]:
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                path = q1a_solver(problemType(state))
+            row.append('%s (%d)' % (re.search(r'expansions: (\d+)', output.getvalue()).group(1), len(path)))
+        rows.append(row)
+
+    print('graph sizes, ms to build, and expansions (path length)')
+    printTable(['layout', 'cells', 'nodes', 'edges', 'build', 'q1a_problem', 'corridor_problem'], rows)
+
+
+def benchLayoutAnalysis(options):
+    """
+    What layoutAnalysis.LayoutAnalysis finds on the largest layouts, and how
+    long the one-time analysis takes.
+    """
+    from layoutAnalysis import LayoutAnalysis
+
+    rows = []
+    for name, layout in largestLayouts(6):
+        analysis = LayoutAnalysis(layout.walls, layout.food)
+        deadEnds = [depth for depth in analysis.deadEndDepth.values() if depth]
+        rows.append([name, len(analysis.cells), len(analysis.blocks), len(analysis.articulationPoints),
+                     len(analysis.bridges) // 2, len(analysis.tunnels), len(deadEnds), max(deadEnds, default=0),
+                     '%.2f' % (timeit(lambda: LayoutAnalysis(layout.walls, layout.food), options.repeat) * 1000)])
+
+    print('cells labelled, and ms per analysis')
+    printTable(['layout', 'cells', 'blocks', 'articulation', 'bridges', 'tunnels', 'dead ends', 'deepest', 'ms'],
+               rows)
+
+
+def benchVisibility(options):
+    """
+    layout.lineOfSight, which Layout.isVisibleFrom answers from, on the
+    largest layouts: the time to sweep a layout and the cost of a query.
+    """
+    import layout as layoutModule
+    from game import Directions
+
+    rows = []
+    for name, layout in largestLayouts(4):
+        rng = random.Random(0)
+        cells = [layout.walls.cellPosition(cellId) for cellId in layout.openCells]
+        directions = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+        queries = [(rng.choice(cells), rng.choice(cells), rng.choice(directions)) for _ in range(1000)]
+        layout.initializeVisibilityMatrix()
+        rows.append([name, len(cells),
+                     '%.2f' % (timeit(lambda: layoutModule.lineOfSight(layout.walls), options.repeat) * 1000),
+                     '%.2f' % (timeit(lambda: [layout.isVisibleFrom(g, p, d) for g, p, d in queries],
+                                      options.repeat) * 1000)])
+
+    print('ms per sweep, and us per isVisibleFrom')
+    printTable(['layout', 'cells', 'sweep', 'query'], rows)
+
+
+BENCHMARKS = {
+    'priorityQueue': benchPriorityQueue,
+    'bfs': benchBfs,
+    'astarFrontier': benchAstarFrontier,
+    'successors': benchSuccessors,
+    'foodMemory': benchFoodMemory,
+    'stateSize': benchStateSize,
+    'explored': benchExplored,
+    'moveApi': benchMoveApi,
+    'legalMoves': benchLegalMoves,
+    'search': benchSearch,
+    'observation': benchObservation,
+    'layoutLoading': benchLayoutLoading,
+    'mazeDistances': benchMazeDistances,
+    'corridors': benchCorridors,
+    'layoutAnalysis': benchLayoutAnalysis,
+    'visibility': benchVisibility,
+}
+
+
+def readCommand(argv):
+    """
+    Processes the command used to run the benchmarks from the command line.
+    """
+    parser = OptionParser(__doc__)
+    parser.add_option('--repeat', dest='repeat', type='int', default=3,
+                      help='How many times to repeat each timing (best is kept) [Default: %default]')
+    parser.add_option('--maxLinear', dest='maxLinear', type='int', default=10 ** 5,
+                      help='Largest size to run O(n) baselines on [Default: %default]')
+
+    options, names = parser.parse_args(argv)
+    if not names or names == ['all']:
+        names = list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error('Unknown benchmark %s, choose from: %s' % (name, ', '.join(BENCHMARKS)))
+    return options, names
+
+
+if __name__ == '__main__':
+    options, names = readCommand(sys.argv[1:])
+    for name in names:
+        BENCHMARKS[name](options)
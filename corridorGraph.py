@@ -0,0 +1,91 @@
+"""
+Layouts contracted to graphs of junctions joined by corridors.
+
+Most open cells of a maze have exactly two open neighbours, so a search
+expanding one cell at a time spends most of its expansions walking down
+corridors.  A CorridorGraph keeps only the cells where something can happen:
+junctions (three or more open neighbours), dead ends (one or none), and any
+key cells the caller names, such as Pacman's start or the food.  Every other
+cell lies on a corridor, which becomes one weighted edge between the nodes
+at its ends, carrying the actions that walk it and the food it passes.
+
+USAGE:      graph = CorridorGraph(walls, food, keyCells=[start])
+            for edge in graph.getEdges(start): ...
+"""
+from game import MoveTable
+
+class CorridorEdge:
+    """
+    A corridor from node start to node end: the actions that walk it, its
+    cost (the number of actions), and the cells with food it passes,
+    including end but not start, in walking order.
+    """
+    __slots__ = ('start', 'end', 'actions', 'cost', 'food')
+
+    def __init__(self, start, end, actions, food):
+        self.start = start
+        self.end = end
+        self.actions = actions
+        self.cost = len(actions)
+        self.food = food
+
+    def __repr__(self):
+        return 'CorridorEdge(%s -> %s, %d)' % (self.start, self.end, self.cost)
+
+class CorridorGraph:
+    """
+    The corridor graph of a wall Grid.  food is an optional food Grid the
+    edges record, and keyCells are open cells that must be nodes even in the
+    middle of a corridor.  moveTable is the MoveTable of the walls, if the
+    caller has one.
+
+    Corridors are walked from every node in each open direction, so every
+    corridor appears once from each end; loops that return to the node they
+    leave are dropped, since no shortest path uses them.  Loops with no node
+    on them at all cannot be reached from any node and are left out.
+    """
+    def __init__(self, walls, food=None, keyCells=(), moveTable=None):
+        self.moveTable = moveTable or MoveTable(walls)
+        keyCells = set(keyCells)
+        self.nodes = [(x, y) for x in range(walls.width) for y in range(walls.height)
+                      if not walls[x][y] and ((x, y) in keyCells or len(self.moveTable.getNeighbors((x, y))) != 2)]
+        nodeSet = set(self.nodes)
+
+        self.edges = {}
+        for node in self.nodes:
+            edges = []
+            for direction, cell in self.moveTable.getNeighbors(node):
+                actions = [direction]
+                cells = [cell]
+                previous = node
+                while cell not in nodeSet:
+                    direction, following = [(d, c) for d, c in self.moveTable.getNeighbors(cell) if c != previous][0]
+                    previous, cell = cell, following
+                    actions.append(direction)
+                    cells.append(cell)
+                if cell != node:
+                    edges.append(CorridorEdge(node, cell, tuple(actions),
+                                              tuple(c for c in cells if food is not None and food[c[0]][c[1]])))
+            self.edges[node] = edges
+
+    def getEdges(self, node):
+        "The CorridorEdges leaving node"
+        return self.edges[node]
+
+    def getNumEdges(self):
+        "The number of corridors, counting each once"
+        return sum(len(edges) for edges in self.edges.values()) // 2
+
+    def expandActions(path):
+        """
+        The primitive actions of a path whose steps are single actions or
+        tuples of actions, such as the edges of a CorridorGraph.
+        """
+        actions = []
+        for step in path:
+            if isinstance(step, tuple):
+                actions.extend(step)
+            else:
+                actions.append(step)
+        return actions
+    expandActions = staticmethod(expandActions)
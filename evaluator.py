@@ -4,19 +4,26 @@ import subprocess
 import sys
 from itertools import chain, product
 from optparse import OptionParser
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
 
 
 
+import ast
+import functools
+import hashlib
 import json
 import os
 import re
 import subprocess
+import time
 from typing import Dict, List
 
 import pandas as pd
 from tqdm import tqdm
 
+import resultsStore
+import util
+
 
 def disclaimer() -> bool:
     message = """
@@ -54,6 +61,218 @@ def run(command: List[str]) -> subprocess.CompletedProcess:
 
     return retval
 
+QUESTIONS: Dict = {
+    'q1a': ('Q1a', 'q1a_solver', ['-p', 'SearchAgent', '-a', 'fn=q1a_solver,prob=q1a_problem', '--timeout=1', '-q']),
+    'q1b': ('Q1b', 'q1b_solver', ['-p', 'SearchAgent', '-a', 'fn=q1b_solver,prob=q1b_problem', '--timeout=5', '-q']),
+    'q1c': ('Q1c', 'q1c_solver', ['-p', 'SearchAgent', '-a', 'fn=q1c_solver,prob=q1c_problem', '--timeout=10', '-q']),
+    'q2': ('Q2', 'Q2_Agent', ['-p', 'Q2_Agent', '--timeout=30', '-q', '-f', '--trackExplored', 'count']),
+}
+
+
+def pacman_args(question: str, layout: str) -> List[str]:
+    """
+    The pacman.py command line arguments that evaluate one layout of a question.
+    """
+    return ['-l', layout] + QUESTIONS[question][2] + ['-o', log_name(layout)]
+
+
+def log_name(layout: str) -> str:
+    return os.path.splitext(os.path.basename(layout))[0]
+
+
+# Where every job starts; the rest of the engine is found from its imports
+ENTRY_SOURCES: List[str] = ['pacman.py']
+
+
+def imported_sources(filename: str) -> List[str]:
+    """
+    The repository modules a source file imports anywhere, including inside
+    functions, as normalised paths.  Names are looked up from the repository
+    root and from the file's own directory; imports that resolve to neither
+    (the standard library, installed packages) are skipped.
+    """
+    try:
+        with open(filename, 'rb') as f:
+            tree = ast.parse(f.read(), filename)
+    except SyntaxError:
+        return []
+
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            # The names imported may be submodules of the package
+            names += [node.module] + [node.module + '.' + alias.name for alias in node.names]
+
+    sources = []
+    for name in names:
+        parts = name.split('.')
+        for depth in range(1, len(parts) + 1):
+            path = os.path.join(*parts[:depth])
+            for root in ('.', os.path.dirname(filename)):
+                for candidate in (path + '.py', os.path.join(path, '__init__.py')):
+                    if os.path.isfile(os.path.join(root, candidate)):
+                        sources.append(os.path.normpath(os.path.join(root, candidate)))
+    return sources
+
+
+@functools.lru_cache(maxsize=None)
+def job_sources(question: str) -> List[str]:
+    """
+    The source files a question's jobs can load: pacman.py, the pacman and
+    ghost agents and any solver or problem named in the agent arguments
+    (looked up the way util.import_by_name finds them), and every repository
+    module those import, followed transitively.
+    """
+    arguments = QUESTIONS[question][2]
+    names = [('./agents', 'RandomGhost')]
+    for flag, value in zip(arguments, arguments[1:]):
+        if flag in ('-p', '--pacman'):
+            names.append(('./agents', value))
+        elif flag in ('-g', '--ghosts'):
+            names[0] = ('./agents', value)
+        elif flag in ('-a', '--agentArgs'):
+            for pair in value.split(','):
+                names += [(directory, pair.split('=')[-1]) for directory in ('./solvers', './problems')]
+    pending = ENTRY_SOURCES + [util.ModuleIndex(directory).find(name) for directory, name in names]
+    sources = set()
+    while pending:
+        source = pending.pop()
+        if source is None or os.path.normpath(source) in sources:
+            continue
+        sources.add(os.path.normpath(source))
+        pending += imported_sources(source)
+    return sorted(sources)
+
+
+def job_key(question: str, layout: str) -> str:
+    """
+    A hash of everything that decides the results of a job: the layout file,
+    the sources it loads, and the pacman.py arguments, which carry the agent
+    arguments, the fixed seed (-f) and the timeout.
+    """
+    digest = hashlib.sha256()
+    digest.update('\0'.join(pacman_args(question, layout)).encode('utf-8'))
+    for filename in [layout] + job_sources(question):
+        digest.update(b'\0' + filename.encode('utf-8') + b'\0')
+        with open(filename, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def job_record(question: str, layout: str, output: str, games: List[Dict], wall_time: float, mode: str) -> Dict:
+    """
+    The results of one (question, layout) job, as stored by resultsStore,
+    plus the average score and win rate formatted as pacman.py prints them.
+    games holds the per-game entries pacman.py writes to its timing report,
+    and mode says how the job was run ('subprocess' or 'pool').  Node
+    expansions are only printed (by the solvers, or by --trackExplored for
+    Q2), so they are read from the output.
+    """
+    import pacman
+
+    record = {'question': question, 'layout': layout, 'solver': QUESTIONS[question][1], 'wall_time': wall_time,
+              'mode': mode, 'average_score': None, 'win_rate': None}
+    expansions = [int(n) for n in re.findall(r"^(?:Number of node expansions:|Explored:)\s*(\d+)", output,
+                                             re.MULTILINE)]
+    if expansions:
+        record['expansions'] = sum(expansions)
+    if not games:
+        return record
+
+    stats = pacman.summaryStats(games)
+    record.update(score=stats['averageScore'],
+                  wins=stats['record'].count('Win'),
+                  draws=stats['record'].count('Draw'),
+                  losses=stats['record'].count('Loss'),
+                  path_length=sum(game['pathLength'] for game in games) / len(games),
+                  peak_memory_kb=max(game['peakMemoryKb'] or 0 for game in games) or None,
+                  average_score=str(stats['averageScore']),
+                  win_rate='%d/%d (%.2f)' % (stats['wins'], stats['numGames'], stats['winRate']))
+    return record
+
+
+def run_subprocess(question: str, layout: str) -> Dict:
+    """
+    Runs pacman.py on one layout in a fresh interpreter and returns its
+    job_record, read from the timing report pacman.py writes next to its log.
+    """
+    report = './logs/' + log_name(layout) + '.timing.json'
+    if os.path.isfile(report): os.remove(report)
+
+    start = time.perf_counter()
+    result = run(['python', 'pacman.py'] + pacman_args(question, layout))
+    wall_time = time.perf_counter() - start
+
+    games = []
+    if os.path.isfile(report):
+        with open(report) as f:
+            games = json.load(f)
+    return job_record(question, layout, result.stdout.decode('utf-8'), games, wall_time, 'subprocess')
+
+
+def run_in_process(job: Tuple[str, int, str]) -> Tuple[str, int, Dict]:
+    """
+    Plays one (question, row, layout) job with the engine already imported
+    into this worker, the way `python pacman.py <arguments>` would, and
+    returns its job_record.  No peak memory is recorded: the worker's peak
+    covers every job it has run, so it would depend on the order of the pool.
+    """
+    import contextlib
+    import io
+    import logging
+
+    import pacman
+    from logs import search_logger
+
+    question, index, layout = job
+    logger = logging.getLogger('root')
+    handlers = list(logger.handlers)
+    output = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output):
+            args = pacman.readCommand(pacman_args(question, layout))
+            search_logger.search_logger(args['outfile'])
+            logging.getLogger('main').info(f"input_args: {args.items()}")
+            games = pacman.runGames(**args)
+    finally:
+        # Each job logs to its own file
+        for handler in logger.handlers[len(handlers):]:
+            logger.removeHandler(handler)
+            handler.close()
+    wall_time = time.perf_counter() - start
+
+    for game in games:
+        game['pathLength'] = len(game['moveHistory'])
+        game['peakMemoryKb'] = None
+    return question, index, job_record(question, layout, output.getvalue(), games, wall_time, 'pool')
+
+
+def run_pool(work: List[Tuple[str, int, str]], jobs: int) -> Iterator[Tuple[str, int, Dict]]:
+    """
+    Evaluates (question, row, layout) jobs across a pool of jobs worker
+    processes, yielding (question, row, job_record) as results come back.
+    """
+    import multiprocessing
+
+    import pacman  # Import the engine once, before the workers fork
+
+    with multiprocessing.Pool(jobs) as pool:
+        yield from tqdm(pool.imap_unordered(run_in_process, work), total=len(work), desc='Running')
+
+
+def run_serial(work: List[Tuple[str, int, str]]) -> Iterator[Tuple[str, int, Dict]]:
+    """
+    Evaluates (question, row, layout) jobs in one pacman.py subprocess each,
+    yielding (question, row, job_record).
+    """
+    for question, index, layout in (t := tqdm(work)):
+        t.set_description(f"Running {QUESTIONS[question][0]}:{layout}")
+        yield question, index, run_subprocess(question, layout)
+
+
 def readCommand( argv ):
     """
     Processes the command used to run pacman from the command line.
@@ -68,6 +287,19 @@ def readCommand( argv ):
     parser.add_option('--q1b', help='Whether to run q1b or not', dest='q1b', action='store_false', default=True)
     parser.add_option('--q1c', help='Whether to run q1c or not', dest='q1c', action='store_false', default=True)
     parser.add_option('--q2', help='Whether to run q2 or not', dest='q2', action='store_false', default=True)
+    parser.add_option('-j', '--jobs', help='Run the games inside this many worker processes instead of one '
+                      'pacman.py subprocess per layout', dest='jobs', type='int', default=0)
+    parser.add_option('--store', help='SQLite file the results of every run are added to', dest='store',
+                      default=resultsStore.DEFAULT_STORE)
+    parser.add_option('--label', help='A name to store this run under, for --compare', dest='label', default=None)
+    parser.add_option('--force', help='Run every job, even those whose inputs match a cached result',
+                      dest='force', action='store_true', default=False)
+    parser.add_option('--cacheMaxAge', help='Evict cached results unused for this many days (default %default)',
+                      dest='cacheMaxAge', type='float', default=30)
+    parser.add_option('--cacheMaxEntries', help='Keep at most this many cached results (default %default)',
+                      dest='cacheMaxEntries', type='int', default=1000)
+    parser.add_option('--compare', help='Report regressions against a stored BASELINE run: an id, a label, '
+                      'a git revision or "previous"', dest='compare', metavar='BASELINE', default=None)
 
     options, otherjunk = parser.parse_args(argv)
     args = dict()
@@ -76,6 +308,13 @@ def readCommand( argv ):
     args['q1b'] = options.q1b
     args['q1c'] = options.q1c
     args['q2'] = options.q2
+    args['jobs'] = options.jobs
+    args['store'] = options.store
+    args['label'] = options.label
+    args['compare'] = options.compare
+    args['force'] = options.force
+    args['cacheMaxAge'] = options.cacheMaxAge
+    args['cacheMaxEntries'] = options.cacheMaxEntries
 
     return args
 
@@ -84,126 +323,55 @@ if __name__ == "__main__":
 
     args = readCommand(sys.argv[1:])
 
-    logs_dir = './logs/'
-    logs = glob.glob(logs_dir + "*.log")
-    for log in logs: os.remove(log)
-
     layouts_dir = "./layouts/"
-    question_1a_pattern = "q1a_*.lay"
-    question_1a_layouts = glob.glob(layouts_dir + question_1a_pattern)
-
-    
-    question_1b_pattern = "q1b_*.lay"
-    question_1b_layouts = glob.glob(layouts_dir + question_1b_pattern)
-
-    
-    question_1c_pattern = "q1c_*.lay"
-    question_1c_layouts = glob.glob(layouts_dir + question_1c_pattern)
-
-    
-    question_2_patterns = "q2_*.lay"
-    question_2_layouts = glob.glob(layouts_dir + question_2_patterns)
-
-    question_1a_setup: Dict = {
-        'layout': question_1a_layouts,
-        'average_score': None,
-        'win_rate': None,
-    }
-
-    question_1b_setup: Dict = {
-        'layout': question_1b_layouts,
-        'average_score': None,
-        'win_rate': None,
-    }
-
-    question_1c_setup: Dict = {
-        'layout': question_1c_layouts,
-        'average_score': None,
-        'win_rate': None,
-    }
-
-    question_2_setup: Dict = {
-        'layout': question_2_layouts,
-        'average_score': None,
-        'win_rate': None,
-    }
-
     if disclaimer() != "y":
         print("")
         exit()
 
-    question_1a = pd.DataFrame(question_1a_setup)
-    question_1b = pd.DataFrame(question_1b_setup)
-    question_1c = pd.DataFrame(question_1c_setup)
-    question_2 = pd.DataFrame(question_2_setup)
-
-    # Question 1a
-    if args["q1a"]:
-        for index, row in (t := tqdm(question_1a.iterrows(), total=question_1a.shape[0])):
-            if not os.path.isfile(row['layout']): continue
-
-            t.set_description(f"Running Q1a:{row['layout']}")
-            command = ['python', 'pacman.py', '-l', row['layout'], '-p', 'SearchAgent', '-a',
-                       'fn=q1a_solver,prob=q1a_problem', '--timeout=1', '-q',
-                       '-o', os.path.splitext(os.path.basename(row['layout']))[0]]
-            result = run(command)
-
-            re_match = re.search(r"Average\sScore:\s*(.*)$", result.stdout.decode('utf-8'), re.MULTILINE)
-            question_1a.at[index, 'average_score'] = re_match.group(1) if re_match else None
-
-            re_match = re.search(r"Win\sRate:\s*(.*)$", result.stdout.decode('utf-8'), re.MULTILINE)
-            question_1a.at[index, 'win_rate'] = re_match.group(1) if re_match else None
-
-    # Question 1b
-    if args["q1b"]:
-        for index, row in (t := tqdm(question_1b.iterrows(), total=question_1b.shape[0])):
-            if not os.path.isfile(row['layout']): continue
-
-            t.set_description(f"Running Q1b:{row['layout']}")
-            command = ['python', 'pacman.py', '-l', row['layout'], '-p', 'SearchAgent', '-a',
-                       'fn=q1b_solver,prob=q1b_problem', '--timeout=5', '-q',
-                       '-o', os.path.splitext(os.path.basename(row['layout']))[0]]
-            result = run(command)
-
-            re_match = re.search(r"Average\sScore:\s*(.*)$", result.stdout.decode('utf-8'), re.MULTILINE)
-            question_1b.at[index, 'average_score'] = re_match.group(1) if re_match else None
-
-            re_match = re.search(r"Win\sRate:\s*(.*)$", result.stdout.decode('utf-8'), re.MULTILINE)
-            question_1b.at[index, 'win_rate'] = re_match.group(1) if re_match else None
-
-    # Question 1c
-    if args["q1c"]:
-        for index, row in (t := tqdm(question_1c.iterrows(), total=question_1c.shape[0])):
-            if not os.path.isfile(row['layout']): continue
-
-            t.set_description(f"Running Q1c:{row['layout']}")
-            command = ['python', 'pacman.py', '-l', row['layout'], '-p', 'SearchAgent', '-a',
-                       'fn=q1c_solver,prob=q1c_problem', '--timeout=10', '-q',
-                       '-o', os.path.splitext(os.path.basename(row['layout']))[0]]
-            result = run(command)
-
-            re_match = re.search(r"Average\sScore:\s*(.*)$", result.stdout.decode('utf-8'), re.MULTILINE)
-            question_1c.at[index, 'average_score'] = re_match.group(1) if re_match else None
-
-            re_match = re.search(r"Win\sRate:\s*(.*)$", result.stdout.decode('utf-8'), re.MULTILINE)
-            question_1c.at[index, 'win_rate'] = re_match.group(1) if re_match else None
-
-    # Question 2
-    if args["q2"]:
-        for index, row in (t := tqdm(question_2.iterrows(), total=question_2.shape[0])):
+    tables: Dict = {}
+    for question in QUESTIONS:
+        tables[question] = pd.DataFrame({
+            'layout': glob.glob(layouts_dir + question + "_*.lay"),
+            'average_score': None,
+            'win_rate': None,
+        })
+
+    store = resultsStore.ResultsStore(args['store'])
+    run_id = store.startRun(args['label'], ' '.join(sys.argv))
+
+    # Jobs whose inputs hash to a cached result reuse it instead of running
+    store.evictCache(args['cacheMaxAge'] * 24 * 3600, args['cacheMaxEntries'])
+    keys = {}
+    cached = []
+    work = []
+    for question, table in tables.items():
+        if not args[question]: continue
+        for index, row in table.iterrows():
             if not os.path.isfile(row['layout']): continue
 
-            t.set_description(f"Running Q2:{row['layout']}")
-            command = ['python', 'pacman.py', '-l', row['layout'], '-p', 'Q2_Agent', '--timeout=30', '-q', '-f',
-                       '-o', os.path.splitext(os.path.basename(row['layout']))[0]]
-            result = run(command)
-
-            re_match = re.search(r"Average\sScore:\s*(.*)$", result.stdout.decode('utf-8'), re.MULTILINE)
-            question_2.at[index, 'average_score'] = re_match.group(1) if re_match else None
-
-            re_match = re.search(r"Win\sRate:\s*(.*)$", result.stdout.decode('utf-8'), re.MULTILINE)
-            question_2.at[index, 'win_rate'] = re_match.group(1) if re_match else None
-
+            keys[question, index] = job_key(question, row['layout'])
+            record = None if args['force'] else store.getCached(keys[question, index])
+            if record is not None:
+                cached.append((question, index, record))
+            else:
+                work.append((question, index, row['layout']))
+    if cached:
+        print(f"Reusing {len(cached)} cached results; --force runs them again")
+
+    # Jobs append to their logs, so the logs of the jobs about to run are
+    # cleared; reused results keep the logs of the run that measured them
+    logs_dir = './logs/'
+    for question, index, layout in work:
+        log = logs_dir + log_name(layout) + '.log'
+        if os.path.isfile(log): os.remove(log)
+
+    results = run_pool(work, args['jobs']) if args['jobs'] > 0 else run_serial(work)
+    reused = set((question, index) for question, index, _ in cached)
+    for question, index, record in chain(cached, results):
+        tables[question].at[index, 'average_score'] = record['average_score']
+        tables[question].at[index, 'win_rate'] = record['win_rate']
+        store.addResult(run_id, record, cached=(question, index) in reused)
+        store.putCached(keys[question, index], record)
 
     pd.set_option('display.max_columns', None)
     pd.set_option('display.max_colwidth', None)
@@ -211,11 +379,18 @@ if __name__ == "__main__":
 
     print("\nEvaluation Report")
     print("=" * 160)
-    print(f"Question 1a Results:\n{question_1a.to_markdown()}\n")
-    print(f"Question 1b Results:\n{question_1b.to_markdown()}\n")
-    print(f"Question 1c Results:\n{question_1c.to_markdown()}\n")
-    print(f"Question 2 Results:\n{question_2.to_markdown()}\n")
+    for question, table in tables.items():
+        print(f"Question {question[1:]} Results:\n{table.to_markdown()}\n")
 
     print("=" * 160)
 
+    if args['compare']:
+        baseline = [i for i in store.selectRuns(args['compare']) if i != run_id]
+        if not baseline:
+            print(f"No stored run matches {args['compare']}")
+        else:
+            print()
+            resultsStore.printComparison(store, baseline, [run_id])
+    store.close()
+
     
@@ -19,12 +19,12 @@
 # purposes. The Pacman AI projects were developed at UC Berkeley, primarily by
 # John DeNero (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
 # For more info, see http://inst.eecs.berkeley.edu/~cs188/sp09/pacman.html
+import bisect
 import logging
 import os
 import sys
 import time
 import traceback
-from math import ceil
 from logs.search_logger import log_function
 from util import *
 
@@ -38,6 +38,12 @@ class Agent:
     following methods which will be called if they exist:
 
     def registerInitialState(self, state): # inspects the starting state
+
+    def setDeadline(self, deadline): # called before each getAction
+      Makes the agent an anytime agent.  deadline is a util.Deadline for
+      the coming move; getAction should return by deadline.expired() and
+      keep deadline.bestAction up to date, as the game plays bestAction
+      rather than crashing the agent if its move timeout fires first.
     """
     def __init__(self, index=0):
         self.index = index
@@ -81,6 +87,7 @@ class Configuration:
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
     """
+    __slots__ = ('pos', 'direction')
 
     def __init__(self, pos, direction):
         self.pos = pos
@@ -127,6 +134,7 @@ class AgentState:
     """
     AgentStates hold the state of an agent (configuration, speed, scared, etc).
     """
+    __slots__ = ('start', 'configuration', 'isPacman', 'scaredTimer', 'numCarrying', 'numReturned')
 
     def __init__( self, startConfiguration, isPacman ):
         self.start = startConfiguration
@@ -151,7 +159,9 @@ class AgentState:
         return hash(hash(self.configuration) + 13 * hash(self.scaredTimer))
 
     def copy( self ):
-        state = AgentState( self.start, self.isPacman )
+        state = AgentState.__new__( AgentState )
+        state.start = self.start
+        state.isPacman = self.isPacman
         state.configuration = self.configuration
         state.scaredTimer = self.scaredTimer
         state.numCarrying = self.numCarrying
@@ -196,6 +206,7 @@ class Grid:
 
     def __eq__(self, other):
         if other == None: return False
+        if isinstance(other, BitGrid): return other == self
         return self.data == other.data
 
     def __hash__(self):
@@ -210,16 +221,33 @@ class Grid:
         return hash(h)
 
     def copy(self):
-        g = Grid(self.width, self.height)
-        g.data = [x[:] for x in self.data]
-        return g
+        return self._withData([x[:] for x in self.data])
 
     def deepCopy(self):
         return self.copy()
 
     def shallowCopy(self):
-        g = Grid(self.width, self.height)
-        g.data = self.data
+        return self._withData(self.data)
+
+    def copyWith(self, x, y, value):
+        """
+        Returns a copy of the grid with cell (x, y) set to value.  Only column
+        x is cloned and the other columns are shared with this grid, so the
+        copy costs O(width + height) instead of O(width * height).  Shared
+        columns must not be written in place afterwards.
+        """
+        data = self.data[:]
+        data[x] = data[x][:]
+        data[x][y] = value
+        return self._withData(data)
+
+    def _withData(self, data):
+        "Builds a grid of the same size around data without allocating fresh cells"
+        g = Grid.__new__(Grid)
+        g.CELLS_PER_INT = self.CELLS_PER_INT
+        g.width = self.width
+        g.height = self.height
+        g.data = data
         return g
 
     def count(self, item =True ):
@@ -232,6 +260,18 @@ class Grid:
                 if self[x][y] == key: list.append( (x,y) )
         return list
 
+    def cellId(self, x, y):
+        """
+        Returns the integer id of cell (x, y).  Ids run column by column, so the
+        neighbours of a cell are id +/- 1 (north/south) and id +/- height
+        (east/west).
+        """
+        return x * self.height + y
+
+    def cellPosition(self, cellId):
+        "Inverse of cellId"
+        return cellId // self.height, cellId % self.height
+
     def packBits(self):
         """
         Returns an efficient int list representation
@@ -252,7 +292,7 @@ class Grid:
         return tuple(bits)
 
     def _cellIndexToPosition(self, index):
-        x = index / self.height
+        x = index // self.height
         y = index % self.height
         return x, y
 
@@ -280,6 +320,161 @@ class Grid:
                 bools.append(False)
         return bools
 
+try:
+    _popcount = int.bit_count
+except AttributeError:
+    def _popcount(n):
+        return bin(n).count('1')
+
+class BitGrid:
+    """
+    A Grid of booleans packed into a single arbitrary-precision int, where
+    bit x * height + y holds cell (x, y) (see Grid.cellId).  Data is accessed
+    via grid[x][y] exactly as for Grid.
+
+    Because ints are immutable, copy() and __hash__ are O(1), count() is a
+    popcount and asList() only visits the set bits.  Writes rebuild the int,
+    so BitGrid suits grids that are copied far more often than written, such
+    as the food grid shared between successor states.
+    """
+    __slots__ = ('width', 'height', 'bits', '_list')
+
+    def __init__(self, width, height, initialValue=False, bits=0):
+        if initialValue not in [False, True]: raise Exception('Grids can only contain booleans')
+        self.width = width
+        self.height = height
+        self.bits = ((1 << (width * height)) - 1) if initialValue else bits
+        self._list = None   # cached asList(), dropped on every write
+
+    def fromGrid(grid):
+        "Returns a BitGrid holding the same values as the Grid grid"
+        bits = 0
+        base = 1
+        for x in range(grid.width):
+            for cell in grid[x]:
+                if cell:
+                    bits |= base
+                base <<= 1
+        return BitGrid(grid.width, grid.height, bits=bits)
+    fromGrid = staticmethod(fromGrid)
+
+    def toGrid(self):
+        "Returns a list-of-lists Grid holding the same values"
+        g = Grid(self.width, self.height)
+        for x, y in self.asList():
+            g[x][y] = True
+        return g
+
+    def __getitem__(self, x):
+        if x < 0: x += self.width
+        if not 0 <= x < self.width: raise IndexError('BitGrid column out of range')
+        return _BitGridColumn(self, x)
+
+    def __setitem__(self, x, column):
+        for y, value in enumerate(column):
+            self[x][y] = value
+
+    def __str__(self):
+        out = [[str(self[x][y])[0] for x in range(self.width)] for y in range(self.height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+    def __eq__(self, other):
+        if other == None: return False
+        if not isinstance(other, BitGrid):
+            if not isinstance(other, Grid): return False
+            other = BitGrid.fromGrid(other)
+        return self.width == other.width and self.height == other.height and self.bits == other.bits
+
+    def __hash__(self):
+        # Matches Grid.__hash__, which packs the cells in the same order
+        return hash(self.bits)
+
+    def copy(self):
+        g = BitGrid(self.width, self.height, bits=self.bits)
+        g._list = self._list
+        return g
+
+    def deepCopy(self):
+        return self.copy()
+
+    def shallowCopy(self):
+        return self.copy()
+
+    def copyWith(self, x, y, value):
+        """
+        Returns a copy of the grid with cell (x, y) set to value, leaving this
+        grid untouched.  Only the new int is allocated.
+        """
+        bit = 1 << self.cellId(x, y)
+        return BitGrid(self.width, self.height, bits=(self.bits | bit) if value else (self.bits & ~bit))
+
+    def count(self, item=True):
+        if item:
+            return _popcount(self.bits)
+        return self.width * self.height - _popcount(self.bits)
+
+    def asList(self, key=True):
+        if key and self._list is not None:
+            return self._list[:]
+        bits = self.bits if key else ~self.bits & ((1 << (self.width * self.height)) - 1)
+        height = self.height
+        list = []
+        while bits:
+            lowest = bits & -bits
+            index = lowest.bit_length() - 1
+            list.append((index // height, index % height))
+            bits ^= lowest
+        if key:
+            self._list = list[:]
+        return list
+
+    def cellId(self, x, y):
+        return x * self.height + y
+
+    def cellPosition(self, cellId):
+        return cellId // self.height, cellId % self.height
+
+    def packBits(self):
+        return self.toGrid().packBits()
+
+class _BitGridColumn:
+    "A view of one column of a BitGrid, so that grid[x][y] reads and writes bits."
+    __slots__ = ('grid', 'x', 'offset')
+
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.x = x
+        self.offset = x * grid.height
+
+    def __getitem__(self, y):
+        height = self.grid.height
+        if y < 0: y += height
+        if not 0 <= y < height: raise IndexError('BitGrid row out of range')
+        return (self.grid.bits >> (self.offset + y)) & 1 == 1
+
+    def __setitem__(self, y, value):
+        height = self.grid.height
+        if y < 0: y += height
+        if not 0 <= y < height: raise IndexError('BitGrid row out of range')
+        if value:
+            self.grid.bits |= 1 << (self.offset + y)
+        else:
+            self.grid.bits &= ~(1 << (self.offset + y))
+        self.grid._list = None
+
+    def __len__(self):
+        return self.grid.height
+
+    def __iter__(self):
+        column = self.grid.bits >> self.offset
+        for y in range(self.grid.height):
+            yield (column >> y) & 1 == 1
+
+    def count(self, item=True):
+        column = (self.grid.bits >> self.offset) & ((1 << self.grid.height) - 1)
+        return _popcount(column) if item else self.grid.height - _popcount(column)
+
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1,2)):
         return bitRep
@@ -376,23 +571,161 @@ class Actions:
     getSuccessor = staticmethod(getSuccessor)
 
 
+class MoveTable:
+    """
+    The legal moves of every cell of a maze, computed once per layout (see
+    Layout.getMoveTable) so that move generation is a table lookup instead
+    of four wall-grid probes per call.
+
+    Cells are indexed by Grid.cellId.  masks[cell] has bit i set when the
+    i-th direction of Actions._directionsAsList leads to an open cell, and
+    the action lists for each of the 32 masks are shared by all tables.
+    """
+    __slots__ = ('width', 'height', 'masks', 'neighbors')
+
+    _ACTIONS = None       # action tuple per mask, filled in below the class
+    _GHOST_ACTIONS = {}   # ghost action tuple per (mask, direction), filled in on demand
+
+    def __init__(self, walls):
+        self.width, self.height = walls.width, walls.height
+        self.masks = array('B', bytes(self.width * self.height))
+        self.neighbors = [()] * (self.width * self.height)
+        for x in range(self.width):
+            for y in range(self.height):
+                mask = 0
+                neighbors = []
+                for i, (direction, (dx, dy)) in enumerate(Actions._directionsAsList):
+                    nextX, nextY = x + dx, y + dy
+                    if 0 <= nextX < self.width and 0 <= nextY < self.height and not walls[nextX][nextY]:
+                        mask |= 1 << i
+                        if direction != Directions.STOP:
+                            neighbors.append((direction, (nextX, nextY)))
+                cell = x * self.height + y
+                self.masks[cell] = mask
+                self.neighbors[cell] = tuple(neighbors)
+
+    def getPossibleActions(self, config):
+        """
+        Same as Actions.getPossibleActions(config, walls) for this table's walls.
+        """
+        x, y = config.pos
+        x_int, y_int = int(x + 0.5), int(y + 0.5)
+
+        # In between grid points, all agents must continue straight
+        if (abs(x - x_int) + abs(y - y_int)  > Actions.TOLERANCE):
+            return [config.direction]
+        return list(MoveTable._ACTIONS[self.masks[x_int * self.height + y_int]])
+
+    def getGhostActions(self, config):
+        """
+        The possible actions less STOP, and less the reverse of the current
+        direction unless it is the only way out.
+        """
+        x, y = config.pos
+        x_int, y_int = int(x + 0.5), int(y + 0.5)
+        if (abs(x - x_int) + abs(y - y_int)  > Actions.TOLERANCE):
+            return [config.direction]
+        key = (self.masks[x_int * self.height + y_int], config.direction)
+        actions = MoveTable._GHOST_ACTIONS.get(key)
+        if actions is None:
+            actions = [d for d in MoveTable._ACTIONS[key[0]] if d != Directions.STOP]
+            reverse = Actions.reverseDirection(config.direction)
+            if reverse in actions and len(actions) > 1:
+                actions.remove(reverse)
+            actions = MoveTable._GHOST_ACTIONS[key] = tuple(actions)
+        return list(actions)
+
+    def getNeighbors(self, position):
+        """
+        The (action, nextPosition) pairs for moving north, south, east and
+        west out of an integral position, in that order, skipping walls.
+        """
+        x, y = position
+        return self.neighbors[x * self.height + y]
+
+_moveDirections = [direction for direction, _ in Actions._directionsAsList]
+MoveTable._ACTIONS = [tuple(d for i, d in enumerate(_moveDirections) if mask >> i & 1)
+                      for mask in range(1 << len(_moveDirections))]
+
+
+# Zobrist hashing: every feature of a state (an agent's configuration and
+# scared timer, a food pellet, a capsule, the score) has a fixed pseudo-random
+# 64-bit key, and a state's hash is the XOR of the keys of its features.
+# Moves and pellets only toggle a few keys, so the hash is kept up to date
+# incrementally instead of being rebuilt from the whole board.
+ZOBRIST_AGENT = 1
+ZOBRIST_FOOD = 2
+ZOBRIST_CAPSULE = 3
+ZOBRIST_SCORE = 4
+_ZOBRIST_MASK = (1 << 64) - 1
+_ZOBRIST_KEYS = {}
+_DIRECTION_CODES = {Directions.NORTH: 1, Directions.SOUTH: 2, Directions.EAST: 3,
+                    Directions.WEST: 4, Directions.STOP: 5}
+
+def _splitmix64(x):
+    x = (x + 0x9E3779B97F4A7C15) & _ZOBRIST_MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _ZOBRIST_MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _ZOBRIST_MASK
+    return x ^ (x >> 31)
+
+def zobristKey(*feature):
+    """
+    Returns the 64-bit key of a feature, a tuple of numbers starting with one
+    of the ZOBRIST_* tags, e.g. zobristKey(ZOBRIST_FOOD, x, y).
+    """
+    key = _ZOBRIST_KEYS.get(feature)
+    if key is None:
+        key = 0
+        for part in feature:
+            # Integral values (including floats such as 3.0) must map equal
+            # numbers to the same key, and hash() folds -1 into -2
+            if part == int(part):
+                part = int(part)
+            else:
+                part = hash(part)
+            key = _splitmix64(key ^ (part & _ZOBRIST_MASK))
+        _ZOBRIST_KEYS[feature] = key
+    return key
+
+def agentZobristKey(agentIndex, configuration, scaredTimer):
+    if configuration == None: return 0
+    x, y = configuration.pos
+    return zobristKey(ZOBRIST_AGENT, agentIndex, x, y, _DIRECTION_CODES[configuration.direction], scaredTimer)
+
 class GameStateData:
 
     verbose: bool = True
+    # Store food as a BitGrid (O(1) copy and hash) instead of a list-of-lists Grid
+    bitboardFood: bool = True
     """
 
     """
-    def __init__( self, prevState = None ):
+    __slots__ = ('food', 'numFood', 'foodPositions', 'capsules', 'agentStates', 'layout', 'score',
+                 'scoreChange', 'zobrist', '_eaten', '_foodEaten', '_foodAdded', '_capsuleEaten', '_agentMoved',
+                 '_lose', '_win')
+    def __init__( self, prevState = None, shareBoard = False ):
         """
         Generates a new data packet by copying information from its predecessor.
+
+        With shareBoard the food grid and capsule list are shared with the
+        predecessor instead of copied.  The rules replace rather than edit
+        them when something is eaten, so this is safe for successors that are
+        only read, e.g. by a search.
         """
         if prevState != None:
-            self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
+            if shareBoard:
+                self.food = prevState.food
+                self.capsules = prevState.capsules
+            else:
+                self.food = prevState.food.shallowCopy()
+                self.capsules = prevState.capsules[:]
+            self.numFood = prevState.numFood
+            self.foodPositions = prevState.foodPositions
             self.agentStates = self.copyAgentStates( prevState.agentStates )
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self.zobrist = prevState.zobrist
 
         self._foodEaten = None
         self._foodAdded = None
@@ -403,9 +736,17 @@ class GameStateData:
         self.scoreChange = 0
 
     def deepCopy( self ):
+        state = self.observationCopy()
+        state.layout = self.layout.deepCopy()
+        return state
+
+    def observationCopy( self ):
+        """
+        A copy to hand to an agent: like deepCopy, but sharing the layout,
+        which is never edited during a game, instead of re-parsing it.
+        """
         state = GameStateData( self )
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
@@ -432,15 +773,38 @@ class GameStateData:
 
     def __hash__( self ):
         """
-        Allows states to be keys of dictionaries.
+        Allows states to be keys of dictionaries.  This is the incrementally
+        maintained 64-bit Zobrist hash, so it costs O(1).
+        """
+        return self.zobrist
+
+    def computeZobrist( self ):
+        """
+        Computes the Zobrist hash of this state from scratch.
+        """
+        h = zobristKey(ZOBRIST_SCORE, self.score)
+        for index, agentState in enumerate( self.agentStates ):
+            h ^= agentZobristKey(index, agentState.configuration, agentState.scaredTimer)
+        for x, y in self.food.asList():
+            h ^= zobristKey(ZOBRIST_FOOD, x, y)
+        for x, y in self.capsules:
+            h ^= zobristKey(ZOBRIST_CAPSULE, x, y)
+        return h
+
+    def updateZobrist( self, prevAgents, prevScore ):
+        """
+        Brings the hash of the previous state up to date with the agent and
+        score changes made since.  prevAgents holds the previous
+        (configuration, scaredTimer) of every agent.  Food and capsules are
+        toggled where they are eaten (PacmanRules.consume).
         """
-        for i, state in enumerate( self.agentStates ):
-            try:
-                int(hash(state))
-            except TypeError as e:
-                print(e)
-                #hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
+        h = self.zobrist
+        for index, ((oldConf, oldTimer), new) in enumerate( zip( prevAgents, self.agentStates ) ):
+            if oldConf is not new.configuration or oldTimer != new.scaredTimer:
+                h ^= agentZobristKey(index, oldConf, oldTimer) ^ agentZobristKey(index, new.configuration, new.scaredTimer)
+        if self.score != prevScore:
+            h ^= zobristKey(ZOBRIST_SCORE, prevScore) ^ zobristKey(ZOBRIST_SCORE, self.score)
+        self.zobrist = h
 
     def __str__( self ):
 
@@ -502,7 +866,14 @@ class GameStateData:
         """
         Creates an initial game state from a layout array (see layout.py).
         """
-        self.food = layout.food.copy()
+        if GameStateData.bitboardFood:
+            self.food = BitGrid.fromGrid(layout.food)
+        else:
+            self.food = layout.food.copy()
+        # Kept up to date by PacmanRules.consume so that nothing on the hot
+        # path needs to scan the food grid
+        self.numFood = self.food.count()
+        self.foodPositions = frozenset(self.food.asList())
         #self.capsules = []
         self.capsules = layout.capsules[:]
         self.layout = layout
@@ -517,6 +888,7 @@ class GameStateData:
                 else: numGhosts += 1
             self.agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
         self._eaten = [False for a in self.agentStates]
+        self.zobrist = self.computeZobrist()
 
 try:
     import boinc
@@ -524,11 +896,80 @@ try:
 except:
     _BOINC_ENABLED = False
 
+class MoveTimings:
+    """
+    The wall-clock and CPU time of each getAction call of one agent, with the
+    summary statistics reported by Game.getTimingReport.
+    """
+    # Upper bounds (seconds) of the latency histogram buckets; the last
+    # bucket collects everything slower
+    HISTOGRAM_BOUNDS = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 30]
+    # A move is near the warning threshold when it takes this fraction of it
+    NEAR_WARNING = 0.8
+
+    def __init__(self, warningTime, maxTotalTime):
+        self.warningTime = warningTime
+        self.maxTotalTime = maxTotalTime
+        self.wall = []
+        self.cpu = []
+        self.nearWarning = []   # indices of moves near the warning threshold
+        self.fallbacks = 0      # moves played from Deadline.bestAction
+        self.crashed = False
+
+    def record(self, wall, cpu):
+        if wall >= self.warningTime * MoveTimings.NEAR_WARNING:
+            self.nearWarning.append(len(self.wall))
+        self.wall.append(wall)
+        self.cpu.append(cpu)
+
+    def percentiles(times):
+        """
+        Nearest-rank p50/p95/p99 and the max of a list of times.
+        """
+        if not times:
+            return {'p50': None, 'p95': None, 'p99': None, 'max': None}
+        ordered = sorted(times)
+        rank = lambda p: ordered[max(0, -(-len(ordered) * p // 100) - 1)]
+        return {'p50': rank(50), 'p95': rank(95), 'p99': rank(99), 'max': ordered[-1]}
+    percentiles = staticmethod(percentiles)
+
+    def histogram(self):
+        """
+        [upper bound, count] for each non-empty bucket of wall times, with
+        None as the bound of the overflow bucket.
+        """
+        bounds = MoveTimings.HISTOGRAM_BOUNDS
+        counts = [0] * (len(bounds) + 1)
+        for wall in self.wall:
+            counts[bisect.bisect_left(bounds, wall)] += 1
+        return [[bound, count] for bound, count in zip(bounds + [None], counts) if count]
+
+    def summary(self):
+        total = sum(self.wall)
+        return {'moves': len(self.wall),
+                'wall': dict(MoveTimings.percentiles(self.wall), total=total),
+                'cpu': dict(MoveTimings.percentiles(self.cpu), total=sum(self.cpu)),
+                'histogram': self.histogram(),
+                'warningTime': self.warningTime,
+                'nearWarning': self.nearWarning,
+                'budget': self.maxTotalTime,
+                'budgetUsed': total / self.maxTotalTime if self.maxTotalTime else None,
+                'fallbacks': self.fallbacks,
+                'crashed': self.crashed}
+
 class Game:
     """
     The Game manages the control flow, soliciting actions from agents.
     """
 
+    # Hand agents a full deepCopy of the state, layout included, rather than
+    # the cheaper state.observationCopy()
+    deepCopyObservations: bool = False
+    # Seconds before its move timeout that an anytime agent's deadline
+    # expires; the timeout itself is brought forward by half as much, so an
+    # interrupted move still ends within the agent's time budget
+    ANYTIME_MARGIN = 0.1
+
     def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False ):
         self.agentCrashed = False
         self.agents = agents
@@ -544,6 +985,25 @@ class Game:
         self.agentTimeout = False
         import io
         self.agentOutput = [io.StringIO() for agent in agents]
+        self.moveTimings = [MoveTimings(rules.getMoveWarningTime(i), rules.getMaxTotalTime(i))
+                            for i in range(len(agents))]
+        self._moveStart = None
+
+    def getTimingReport(self):
+        """
+        Per-agent latency statistics of the getAction calls so far (see
+        MoveTimings.summary), in agent order.
+        """
+        return [timings.summary() for timings in self.moveTimings]
+
+    def _startMove(self, agentIndex):
+        self._moveStart = (agentIndex, time.perf_counter(), time.process_time())
+
+    def _endMove(self):
+        if self._moveStart is None: return
+        agentIndex, wall, cpu = self._moveStart
+        self.moveTimings[agentIndex].record(time.perf_counter() - wall, time.process_time() - cpu)
+        self._moveStart = None
 
     def getProgress(self):
         if self.gameOver:
@@ -551,9 +1011,19 @@ class Game:
         else:
             return self.rules.getProgress(self)
 
+    def observation( self ):
+        """
+        Returns the copy of the current state that is shown to an agent.
+        """
+        if Game.deepCopyObservations or not hasattr( self.state, 'observationCopy' ):
+            return self.state.deepCopy()
+        return self.state.observationCopy()
+
     def _agentCrash( self, agentIndex, quiet=False):
         "Helper method for handling agent crashes"
         if not quiet: traceback.print_exc()
+        self._endMove()
+        self.moveTimings[agentIndex].crashed = True
         self.gameOver = True
         self.agentCrashed = True
         self.rules.agentCrash(self, agentIndex)
@@ -607,7 +1077,7 @@ class Game:
                         timed_func = TimeoutFunction(agent.registerInitialState, self.rules.getMaxStartupTime(i))
                         try:
                             start_time = time.time()
-                            timed_func(self.state.deepCopy())
+                            timed_func(self.observation())
                             time_taken = time.time() - start_time
                             self.totalAgentTimes[i] += time_taken
                         except TimeoutFunctionException:
@@ -622,7 +1092,7 @@ class Game:
                         self.unmute()
                         return
                 else:
-                    agent.registerInitialState(self.state.deepCopy())
+                    agent.registerInitialState(self.observation())
                 ## TODO: could this exceed the total time
                 self.unmute()
 
@@ -645,7 +1115,7 @@ class Game:
                         timed_func = TimeoutFunction(agent.observationFunction, self.rules.getMoveTimeout(agentIndex))
                         try:
                             start_time = time.time()
-                            observation = timed_func(self.state.deepCopy())
+                            observation = timed_func(self.observation())
                         except TimeoutFunctionException:
                             skip_action = True
                         move_time += time.time() - start_time
@@ -655,30 +1125,42 @@ class Game:
                         self.unmute()
                         return
                 else:
-                    observation = agent.observationFunction(self.state.deepCopy())
+                    observation = agent.observationFunction(self.observation())
                 self.unmute()
             else:
-                observation = self.state.deepCopy()
+                observation = self.observation()
 
             # Solicit an action
             action = None
             self.mute(agentIndex)
+            self._startMove(agentIndex)
+            moveTimeout = self.rules.getMoveTimeout(agentIndex) - self.totalAgentTimes[agentIndex]
+            deadline = None
+            if hasattr(agent, 'setDeadline'):
+                deadline = Deadline(moveTimeout - Game.ANYTIME_MARGIN)
+                agent.setDeadline(deadline)
+                moveTimeout -= Game.ANYTIME_MARGIN / 2
             if self.catchExceptions:
                 try:
-                    timed_func = TimeoutFunction(agent.getAction, ceil(self.rules.getMoveTimeout(agentIndex) - self.totalAgentTimes[agentIndex]))
+                    timed_func = TimeoutFunction(agent.getAction, moveTimeout)
                     try:
                         start_time = time.time()
                         if skip_action:
                             raise TimeoutFunctionException()
                         action = timed_func( observation )
                     except TimeoutFunctionException:
-                        logger.error(f"Agent {agentIndex} timed out!")
-                        print(f"Agent {agentIndex} timed out!")
-                        self.agentTimeout = True
-                        self._agentCrash(agentIndex, quiet=True)
-                        self.unmute()
-                        return
+                        if skip_action or deadline is None or deadline.bestAction is None:
+                            logger.error(f"Agent {agentIndex} timed out!")
+                            print(f"Agent {agentIndex} timed out!")
+                            self.agentTimeout = True
+                            self._agentCrash(agentIndex, quiet=True)
+                            self.unmute()
+                            return
+                        logger.warning(f"Agent {agentIndex} timed out; playing its best action so far")
+                        self.moveTimings[agentIndex].fallbacks += 1
+                        action = deadline.bestAction
                     except OutOfActions:
+                        self._endMove()
                         self.state.data._win = True
                         return 
 
@@ -710,6 +1192,7 @@ class Game:
                     return
             else:
                 action = agent.getAction(observation)
+            self._endMove()
             self.unmute()
 
             # Execute the action
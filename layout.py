@@ -14,12 +14,19 @@
 
 import os
 import random
-from functools import reduce
-
-from game import Grid
+import struct
+from array import array
+from game import Actions, Directions, Grid, MoveTable
 from util import manhattanDistance
 
+# Structures derived from the walls (and starting food) by gridKey, so that
+# every copy of a layout, and every layout with the same walls, shares one
 VISIBILITY_MATRIX_CACHE = {}
+MOVE_TABLE_CACHE = {}
+LAYOUT_ANALYSIS_CACHE = {}
+
+# Parsed layouts by (real path, modification time); getLayout hands out copies
+LAYOUT_CACHE = {}
 
 class Layout:
     """
@@ -37,31 +44,62 @@ class Layout:
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
-        # self.initializeVisibilityMatrix()
+        self.openCells = [cellId for cellId, wall in enumerate(cell for column in self.walls.data for cell in column)
+                          if not wall]
+        self.moveTable = None
+        self.mazeDistances = None
+        self.analysis = None
+        self.visibility = None
 
     def getNumGhosts(self):
         return self.numGhosts
 
+    def getMoveTable(self):
+        """
+        Returns the MoveTable of this layout's walls, built on first use.
+        """
+        if self.moveTable is None:
+            key = gridKey(self.walls)
+            if key not in MOVE_TABLE_CACHE:
+                MOVE_TABLE_CACHE[key] = MoveTable(self.walls)
+            self.moveTable = MOVE_TABLE_CACHE[key]
+        return self.moveTable
+
+    def getMazeDistances(self):
+        """
+        Returns the MazeDistances (in mazeDistances.py) of this layout's
+        walls, found on first use.
+        """
+        if self.mazeDistances is None:
+            from mazeDistances import getMazeDistances
+            self.mazeDistances = getMazeDistances(self.walls)
+        return self.mazeDistances
+
+    def getLayoutAnalysis(self):
+        """
+        Returns the LayoutAnalysis (in layoutAnalysis.py) of this layout's
+        walls and starting food, made on first use.
+        """
+        if self.analysis is None:
+            from layoutAnalysis import LayoutAnalysis
+            key = (gridKey(self.walls), gridKey(self.food))
+            if key not in LAYOUT_ANALYSIS_CACHE:
+                LAYOUT_ANALYSIS_CACHE[key] = LayoutAnalysis(self.walls, self.food, self.getMoveTable())
+            self.analysis = LAYOUT_ANALYSIS_CACHE[key]
+        return self.analysis
+
     def initializeVisibilityMatrix(self):
-        global VISIBILITY_MATRIX_CACHE
-        if reduce(str.__add__, self.layoutText) not in VISIBILITY_MATRIX_CACHE:
-            from game import Directions
-            vecs = [(-0.5,0), (0.5,0),(0,-0.5),(0,0.5)]
-            dirs = [Directions.NORTH, Directions.SOUTH, Directions.WEST, Directions.EAST]
-            vis = Grid(self.width, self.height, {Directions.NORTH:set(), Directions.SOUTH:set(), Directions.EAST:set(), Directions.WEST:set(), Directions.STOP:set()})
-            for x in range(self.width):
-                for y in range(self.height):
-                    if self.walls[x][y] == False:
-                        for vec, direction in zip(vecs, dirs):
-                            dx, dy = vec
-                            nextx, nexty = x + dx, y + dy
-                            while (nextx + nexty) != int(nextx) + int(nexty) or not self.walls[int(nextx)][int(nexty)] :
-                                vis[x][y][direction].add((nextx, nexty))
-                                nextx, nexty = x + dx, y + dy
-            self.visibility = vis
-            VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)] = vis
-        else:
-            self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
+        """
+        Sets visibility to Pacman's line of sight from every cell: for each
+        direction, an array holding, at the cell's id (x * height + y), the
+        number of open cells before the next wall in that direction.  Each
+        row and column is swept once, and layouts with the same walls share
+        the arrays.
+        """
+        key = gridKey(self.walls)
+        if key not in VISIBILITY_MATRIX_CACHE:
+            VISIBILITY_MATRIX_CACHE[key] = lineOfSight(self.walls)
+        self.visibility = VISIBILITY_MATRIX_CACHE[key]
 
     def isWall(self, pos):
         x, col = pos
@@ -85,14 +123,44 @@ class Layout:
         return pos
 
     def isVisibleFrom(self, ghostPos, pacPos, pacDirection):
-        row, col = [int(x) for x in pacPos]
-        return ghostPos in self.visibility[row][col][pacDirection]
+        """
+        Whether a ghost at ghostPos, possibly between cells, is in the line
+        of sight of Pacman at pacPos facing pacDirection: in the same row or
+        column, ahead of Pacman and with no wall in between.  Pacman sees
+        nothing while stopped.
+        """
+        if pacDirection == Directions.STOP:
+            return False
+        if self.visibility is None:
+            self.initializeVisibilityMatrix()
+        x, y = [int(v) for v in pacPos]
+        dx, dy = Actions._directions[pacDirection]
+        ghostX, ghostY = ghostPos
+        if dx:
+            ahead = (ghostX - x) * dx if ghostY == y else 0
+        else:
+            ahead = (ghostY - y) * dy if ghostX == x else 0
+        return 0 < ahead <= self.visibility[pacDirection][x * self.height + y] + 0.5
 
     def __str__(self):
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        """
+        A copy with its own grids and lists, made without parsing the text
+        again.
+        """
+        layout = Layout.__new__(Layout)
+        layout.__dict__.update(self.__dict__)
+        layout.walls = self.walls.copy()
+        layout.food = self.food.copy()
+        layout.capsules = self.capsules[:]
+        layout.agentPositions = self.agentPositions[:]
+        layout.layoutText = self.layoutText[:]
+        # openCells, moveTable, mazeDistances, analysis and visibility
+        # describe the walls and starting food, which are never edited, so
+        # they are shared
+        return layout
 
     def processLayoutText(self, layoutText):
         """
@@ -133,21 +201,159 @@ class Layout:
 
 
 def getLayout(name, back = 2):
+    """
+    Loads the layout called name, from layouts/ or as a path, looking in up
+    to back parent directories as well.  Each file is only read once per
+    process while it is unchanged; every call returns a fresh copy.
+    """
     if name.endswith('.lay'):
-        layout = tryToLoad('layouts/' + name)
-        if layout == None: layout = tryToLoad(name)
+        candidates = ['layouts/' + name, name]
     else:
-        layout = tryToLoad('layouts/' + name + '.lay')
-        if layout == None: layout = tryToLoad(name + '.lay')
-    if layout == None and back >= 0:
-        curdir = os.path.abspath('.')
-        os.chdir('..')
-        layout = getLayout(name, back -1)
-        os.chdir(curdir)
-    return layout
+        candidates = ['layouts/' + name + '.lay', name + '.lay']
+    for level in range(back + 2):
+        for candidate in candidates:
+            layout = tryToLoad(os.path.join(*(['..'] * level + [candidate])))
+            if layout != None: return layout
+    return None
 
 def tryToLoad(fullname):
     if(not os.path.exists(fullname)): return None
-    f = open(fullname)
-    try: return Layout([line.strip() for line in f])
-    finally: f.close()
+    path = os.path.realpath(fullname)
+    key = (path, os.stat(path).st_mtime_ns)
+    if key not in LAYOUT_CACHE:
+        LAYOUT_CACHE[key] = loadCompiledLayout(path)
+    return LAYOUT_CACHE[key].deepCopy()
+
+# Compiled layouts are kept in a __pycache__ directory beside the .lay files:
+# a header, the text, the wall and food bitmaps (bit x * height + y, as in
+# game.BitGrid), then unsigned ints for the capsules (x, y), the agents
+# (isPacman, x, y) and the open cell ids.
+COMPILED_MAGIC = b'LAYC'
+COMPILED_VERSION = 1
+COMPILED_HEADER = struct.Struct('<4sHqqHHIHHI')
+
+def compiledPath(path):
+    directory, filename = os.path.split(path)
+    return os.path.join(directory, '__pycache__', filename + 'c')
+
+def loadCompiledLayout(path):
+    """
+    The layout in the .lay file at path, read from its compiled form when
+    that is up to date, otherwise parsed and compiled for next time.
+    """
+    status = os.stat(path)
+    try:
+        with open(compiledPath(path), 'rb') as f:
+            data = f.read()
+        magic, version, mtime, size, width, height, textLength, numCapsules, numAgents, numOpen = \
+            COMPILED_HEADER.unpack_from(data)
+    except (OSError, struct.error):
+        magic = None
+    if magic != COMPILED_MAGIC or version != COMPILED_VERSION or (mtime, size) != (status.st_mtime_ns, status.st_size):
+        with open(path) as f:
+            layout = Layout([line.strip() for line in f])
+        saveCompiledLayout(layout, path, status)
+        return layout
+
+    offset = COMPILED_HEADER.size
+    layoutText = data[offset:offset + textLength].decode('utf-8').split('\n')
+    offset += textLength
+    cells = width * height
+    bitmapLength = (cells + 7) // 8
+    walls = int.from_bytes(data[offset:offset + bitmapLength], 'little')
+    food = int.from_bytes(data[offset + bitmapLength:offset + 2 * bitmapLength], 'little')
+    numbers = array('I')
+    numbers.frombytes(data[offset + 2 * bitmapLength:])
+
+    layout = Layout.__new__(Layout)
+    layout.width = width
+    layout.height = height
+    layout.walls = bitmapGrid(walls, width, height)
+    layout.food = bitmapGrid(food, width, height)
+    layout.capsules = [(numbers[i], numbers[i + 1]) for i in range(0, 2 * numCapsules, 2)]
+    agents = numbers[2 * numCapsules:2 * numCapsules + 3 * numAgents]
+    layout.agentPositions = [(bool(agents[i]), (agents[i + 1], agents[i + 2])) for i in range(0, len(agents), 3)]
+    layout.numGhosts = sum(1 for isPacman, pos in layout.agentPositions if not isPacman)
+    layout.layoutText = layoutText
+    layout.totalFood = bin(food).count('1')
+    layout.openCells = numbers[2 * numCapsules + 3 * numAgents:].tolist()
+    layout.moveTable = None
+    layout.mazeDistances = None
+    layout.analysis = None
+    layout.visibility = None
+    return layout
+
+def saveCompiledLayout(layout, path, status):
+    text = '\n'.join(layout.layoutText).encode('utf-8')
+    numbers = array('I')
+    for x, y in layout.capsules:
+        numbers.extend((x, y))
+    for isPacman, (x, y) in layout.agentPositions:
+        numbers.extend((isPacman, x, y))
+    numbers.extend(layout.openCells)
+    bitmapLength = (layout.width * layout.height + 7) // 8
+    header = COMPILED_HEADER.pack(COMPILED_MAGIC, COMPILED_VERSION, status.st_mtime_ns, status.st_size,
+                                  layout.width, layout.height, len(text), len(layout.capsules),
+                                  len(layout.agentPositions), len(layout.openCells))
+    target = compiledPath(path)
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temporary = '%s.%d' % (target, os.getpid())
+        with open(temporary, 'wb') as f:
+            f.write(header + text + gridBits(layout.walls).to_bytes(bitmapLength, 'little') +
+                    gridBits(layout.food).to_bytes(bitmapLength, 'little') + numbers.tobytes())
+        os.replace(temporary, target)
+    except OSError:
+        pass # Parsed again next time
+
+def lineOfSight(walls):
+    """
+    {direction: array of reaches} for initializeVisibilityMatrix.  Every
+    maximal run of open cells in a row or column is found in one sweep, and
+    a cell's reach in a direction is its distance to that end of its run.
+    """
+    width, height = walls.width, walls.height
+    reaches = dict((direction, array('H', bytes(2 * width * height)))
+                   for direction in (Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST))
+    north, south = reaches[Directions.NORTH], reaches[Directions.SOUTH]
+    east, west = reaches[Directions.EAST], reaches[Directions.WEST]
+    for x in range(width):
+        column = walls[x]
+        start = 0
+        for y in range(height + 1):
+            if y == height or column[y]:
+                for inRun in range(start, y):
+                    south[x * height + inRun] = inRun - start
+                    north[x * height + inRun] = y - 1 - inRun
+                start = y + 1
+    for y in range(height):
+        start = 0
+        for x in range(width + 1):
+            if x == width or walls[x][y]:
+                for inRun in range(start, x):
+                    west[inRun * height + y] = inRun - start
+                    east[inRun * height + y] = x - 1 - inRun
+                start = x + 1
+    return reaches
+
+def gridKey(grid):
+    "A hashable key of a Grid's size and cells, for the caches at the top"
+    return grid.width, grid.height, b''.join(map(bytes, grid.data))
+
+def gridBits(grid):
+    "The cells of a Grid as an int, bit x * height + y holding cell (x, y)"
+    bits = 0
+    for x in reversed(range(grid.width)):
+        for y in reversed(range(grid.height)):
+            bits = (bits << 1) | bool(grid[x][y])
+    return bits
+
+def bitmapGrid(bits, width, height):
+    "The Grid whose cells gridBits(grid) packs into bits"
+    grid = Grid.__new__(Grid)
+    grid.CELLS_PER_INT = 30
+    grid.width = width
+    grid.height = height
+    cells = format(bits, '0%db' % (width * height))[::-1]
+    grid.data = [[cell == '1' for cell in cells[x * height:(x + 1) * height]] for x in range(width)]
+    return grid
@@ -0,0 +1,158 @@
+"""
+One-time structural analysis of a layout: dead ends, tunnels and
+chokepoints, for solvers to prune with and agents to judge traps by.
+
+All labels come from two linear passes over the open cells.  A depth-first
+search finds the biconnected components (blocks), the articulation points
+and the bridges (Hopcroft and Tarjan), and numbers the cells in preorder so
+that what lies beyond a bridge is a range of that numbering.  Repeatedly
+removing cells with at most one remaining open neighbour then leaves the
+cycles and the paths between them; what it removes are the dead ends.
+
+USAGE:      analysis = gameState.getLayoutAnalysis()
+            analysis.getDeadEndDepth(pos)       # steps into a dead end
+            analysis.getFoodBeyond(pos, next)   # food past a bridge, or None
+"""
+from game import MoveTable
+
+class LayoutAnalysis:
+    """
+    The analysis of a wall Grid.  food is the food Grid getFoodBeyond counts,
+    normally the layout's starting food.
+
+    Per open cell:
+      deadEndDepth  0 off dead ends, else the number of steps in from the
+                    nearest cell on or between cycles.  A component with no
+                    cycle at all has nothing to be a dead end of, and stays 0.
+      articulation  whether removing the cell disconnects its component,
+                    so every path from one side to the other passes it.
+      tunnel        an articulation point with two open neighbours: a
+                    corridor cell that cannot be gone around.
+    """
+    def __init__(self, walls, food=None, moveTable=None):
+        moveTable = moveTable or MoveTable(walls)
+        self.cells = [(x, y) for x in range(walls.width) for y in range(walls.height) if not walls[x][y]]
+        self.neighbors = {cell: [position for _, position in moveTable.getNeighbors(cell)] for cell in self.cells}
+        self.findBlocks()
+        self.findDeadEnds()
+        self.tunnels = set(cell for cell in self.articulationPoints if len(self.neighbors[cell]) == 2)
+
+        self.foodPrefix = [0]
+        for cell in sorted(self.cells, key=self.preorder.__getitem__):
+            self.foodPrefix.append(self.foodPrefix[-1] + (1 if food is not None and food[cell[0]][cell[1]] else 0))
+
+    def findBlocks(self):
+        """
+        Iterative depth-first search filling preorder, subtreeEnd (the last
+        preorder number in each cell's subtree), parent, root (of each
+        cell's component), articulationPoints, bridges (both directions)
+        and blocks (the cell sets of the biconnected components).
+        """
+        self.preorder = {}
+        self.subtreeEnd = {}
+        self.parent = {}
+        self.root = {}
+        self.articulationPoints = set()
+        self.bridges = set()
+        self.blocks = []
+        low = {}
+        counter = 0
+        for root in self.cells:
+            if root in self.preorder:
+                continue
+            self.preorder[root] = low[root] = counter
+            self.root[root] = root
+            counter += 1
+            rootChildren = 0
+            edges = []
+            stack = [(root, iter(self.neighbors[root]))]
+            while stack:
+                cell, children = stack[-1]
+                for child in children:
+                    if child not in self.preorder:
+                        self.parent[child] = cell
+                        self.root[child] = root
+                        self.preorder[child] = low[child] = counter
+                        counter += 1
+                        edges.append((cell, child))
+                        stack.append((child, iter(self.neighbors[child])))
+                        break
+                    if child != self.parent.get(cell) and self.preorder[child] < self.preorder[cell]:
+                        low[cell] = min(low[cell], self.preorder[child])
+                        edges.append((cell, child))
+                else:
+                    stack.pop()
+                    self.subtreeEnd[cell] = counter - 1
+                    if not stack:
+                        continue
+                    up = stack[-1][0]
+                    low[up] = min(low[up], low[cell])
+                    if up == root:
+                        rootChildren += 1
+                    if low[cell] >= self.preorder[up]:
+                        # Nothing below cell reaches above up: up closes a block
+                        block = set()
+                        while True:
+                            edge = edges.pop()
+                            block.update(edge)
+                            if edge == (up, cell):
+                                break
+                        self.blocks.append(block)
+                        if up != root:
+                            self.articulationPoints.add(up)
+                    if low[cell] > self.preorder[up]:
+                        self.bridges.add((up, cell))
+                        self.bridges.add((cell, up))
+            if rootChildren > 1:
+                self.articulationPoints.add(root)
+
+    def findDeadEnds(self):
+        "Peels dead ends off from their tips, then numbers them from the inside out"
+        degree = {cell: len(neighbors) for cell, neighbors in self.neighbors.items()}
+        peeled = set(cell for cell in self.cells if degree[cell] <= 1)
+        tips = list(peeled)
+        while tips:
+            cell = tips.pop()
+            for neighbor in self.neighbors[cell]:
+                if neighbor not in peeled:
+                    degree[neighbor] -= 1
+                    if degree[neighbor] <= 1:
+                        peeled.add(neighbor)
+                        tips.append(neighbor)
+
+        self.deadEndDepth = dict.fromkeys(self.cells, 0)
+        frontier = [cell for cell in self.cells if cell not in peeled]
+        depth = 0
+        while frontier:
+            depth += 1
+            nextFrontier = []
+            for cell in frontier:
+                for neighbor in self.neighbors[cell]:
+                    if neighbor in peeled and self.deadEndDepth[neighbor] == 0:
+                        self.deadEndDepth[neighbor] = depth
+                        nextFrontier.append(neighbor)
+            frontier = nextFrontier
+
+    def getDeadEndDepth(self, cell):
+        return self.deadEndDepth[cell]
+
+    def isArticulationPoint(self, cell):
+        return cell in self.articulationPoints
+
+    def isTunnel(self, cell):
+        return cell in self.tunnels
+
+    def getFoodBeyond(self, cell, neighbor):
+        """
+        The food on the far side of the step from cell to the adjacent cell
+        neighbor, if that step crosses a bridge: everything reachable from
+        neighbor without passing cell.  None when the step is not a bridge,
+        since the far side can then be reached another way.
+        """
+        if (cell, neighbor) not in self.bridges:
+            return None
+        if self.parent.get(neighbor) == cell:
+            return self.foodPrefix[self.subtreeEnd[neighbor] + 1] - self.foodPrefix[self.preorder[neighbor]]
+        root = self.root[cell]
+        return (self.foodPrefix[self.subtreeEnd[root] + 1] - self.foodPrefix[self.preorder[root]]) - \
+            (self.foodPrefix[self.subtreeEnd[cell] + 1] - self.foodPrefix[self.preorder[cell]])
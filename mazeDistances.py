@@ -0,0 +1,176 @@
+"""
+True maze distances between every pair of open cells of a layout.
+
+MazeDistances runs one breadth-first search from each open cell and keeps
+the results as a square matrix of unsigned 16-bit distances, so a distance
+costs two dict lookups and an index, as cheap as a Manhattan distance.  The
+matrix is saved under layouts/__pycache__, named by a hash of the walls, and
+memory-mapped from there by later processes instead of being searched again.
+
+USAGE:      distances = gameState.getMazeDistances()
+            distances.getDistance((1, 1), (5, 3))
+            distances.getNextHop((1, 1), (5, 3))   # (direction, position)
+"""
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from game import Actions, Directions
+
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'layouts', '__pycache__')
+
+# Stored for pairs of cells with no path between them
+UNREACHABLE = 0xFFFF
+
+HEADER = struct.Struct('<4sHHI4x')
+MAGIC = b'MAZD'
+
+# MazeDistances by wall hash, so that every copy of a layout shares one
+_MAZE_DISTANCES = {}
+
+def getMazeDistances(walls):
+    """
+    The MazeDistances of a wall Grid, built, loaded from the disk cache or
+    reused from earlier in the process.
+    """
+    key = wallsHash(walls)
+    if key not in _MAZE_DISTANCES:
+        _MAZE_DISTANCES[key] = MazeDistances(walls, key)
+    return _MAZE_DISTANCES[key]
+
+def wallsHash(walls):
+    digest = hashlib.sha1(('%d %d %s ' % (walls.width, walls.height, sys.byteorder)).encode('ascii'))
+    for column in walls.data:
+        digest.update(bytes(column))
+    return digest.hexdigest()
+
+class MazeDistances:
+    """
+    All-pairs shortest path lengths over the open cells of a wall Grid.
+
+    Open cells are numbered column by column (the order of Grid.cellId), and
+    the distance from cell i to cell j is entry i * size + j of distances.
+    Positions passed in must be integer grid points; use util.nearestPoint
+    on the positions of ghosts between cells.
+    """
+    def __init__(self, walls, key=None, cacheDirectory=CACHE_DIRECTORY):
+        self.width = walls.width
+        self.height = walls.height
+        self.cells = [(x, y) for x in range(walls.width) for y in range(walls.height) if not walls[x][y]]
+        self.size = len(self.cells)
+        if self.size >= UNREACHABLE:
+            raise Exception('Too many open cells for 16-bit maze distances: %d' % self.size)
+        self.index = {cell: i for i, cell in enumerate(self.cells)}
+
+        # Open neighbours of each cell as (direction, position, index), in the
+        # order of Actions._directionsAsList
+        self.neighbors = []
+        for x, y in self.cells:
+            moves = []
+            for direction, (dx, dy) in Actions._directionsAsList:
+                if direction != Directions.STOP and (x + dx, y + dy) in self.index:
+                    moves.append((direction, (x + dx, y + dy), self.index[(x + dx, y + dy)]))
+            self.neighbors.append(tuple(moves))
+
+        self.path = None
+        if cacheDirectory is not None:
+            self.path = os.path.join(cacheDirectory, 'mazeDistances-%s.bin' % (key or wallsHash(walls)))
+        self.distances = self.load()
+        if self.distances is None:
+            self.distances = self.build()
+            self.save()
+
+    def build(self):
+        """
+        Runs a breadth-first search from every open cell and returns the
+        distances as an array of unsigned shorts.
+        """
+        size = self.size
+        adjacent = [tuple(index for _, _, index in moves) for moves in self.neighbors]
+        distances = array('H')
+        for source in range(size):
+            row = [UNREACHABLE] * size
+            row[source] = 0
+            frontier = [source]
+            depth = 0
+            while frontier:
+                depth += 1
+                nextFrontier = []
+                for cell in frontier:
+                    for neighbor in adjacent[cell]:
+                        if row[neighbor] == UNREACHABLE:
+                            row[neighbor] = depth
+                            nextFrontier.append(neighbor)
+                frontier = nextFrontier
+            distances.extend(row)
+        return distances
+
+    def load(self):
+        """
+        Memory-maps the cached matrix, or returns None when there is no
+        usable cache file.
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return None # An empty file
+        if len(mapped) != HEADER.size + 2 * self.size * self.size or \
+                HEADER.unpack_from(mapped) != (MAGIC, self.width, self.height, self.size):
+            mapped.close()
+            return None
+        return memoryview(mapped)[HEADER.size:].cast('H')
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary = '%s.%d' % (self.path, os.getpid())
+            with open(temporary, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, self.width, self.height, self.size))
+                f.write(self.distances.tobytes())
+            os.replace(temporary, self.path)
+        except (OSError, TypeError):
+            pass # No cache directory (or none wanted): searched again next time
+
+    def getDistance(self, start, end):
+        """
+        The length of a shortest path between two open cells, or infinity
+        when there is none.
+        """
+        distance = self.distances[self.index[start] * self.size + self.index[end]]
+        return distance if distance != UNREACHABLE else float('inf')
+
+    def getNextHop(self, start, end):
+        """
+        The first step of a shortest path from start to end as (direction,
+        position), or None when start is end or end cannot be reached.
+        Among equally short paths, the first direction in the order of
+        Actions._directionsAsList is taken, so following next hops gives the
+        path a breadth-first search expanding neighbours in that order finds.
+        """
+        distances, size, target = self.distances, self.size, self.index[end]
+        remaining = distances[self.index[start] * size + target]
+        if remaining == 0 or remaining == UNREACHABLE:
+            return None
+        for direction, position, index in self.neighbors[self.index[start]]:
+            if distances[index * size + target] == remaining - 1:
+                return direction, position
+        return None
+
+    def getPath(self, start, end):
+        """
+        The directions of a shortest path from start to end (see getNextHop),
+        or None when end cannot be reached.
+        """
+        if self.getDistance(start, end) == float('inf'):
+            return None
+        path = []
+        while start != end:
+            direction, start = self.getNextHop(start, end)
+            path.append(direction)
+        return path
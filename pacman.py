@@ -44,7 +44,8 @@ import os
 import random
 import sys
 
-from game import Actions, Directions, Game, GameStateData
+from game import (ZOBRIST_CAPSULE, ZOBRIST_FOOD, Actions, Configuration,
+                  Directions, Game, GameStateData, zobristKey)
 from layout import getLayout
 from logs import search_logger
 from util import import_by_name, manhattanDistance, nearestPoint
@@ -67,19 +68,80 @@ class GameState:
 
     Note that in classic Pacman, Pacman is always agent 0.
     """
+    __slots__ = ('data',)
 
     ####################################################
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions called
+    # Exploration tracking is instrumentation only and is off by default, as
+    # hashing and keeping every generated state alive dominates long games.
+    #   None      - no tracking
+    #   'count'   - count the successors generated
+    #   'bounded' - also estimate the number of distinct states from a
+    #               fixed-size table of state hashes
+    #   'full'    - keep every state in GameState.explored (unbounded memory)
+    EXPLORED_MODES = [None, 'count', 'bounded', 'full']
+    EXPLORED_TABLE_SIZE = 1 << 20
+    exploredMode = None
     explored = set()
+    exploredCount = 0
+    exploredDistinct = 0
+    exploredTable = None
+
+    def setExploredMode( mode ):
+        """
+        Selects how generateSuccessor records explored states (see above) and
+        resets everything recorded so far.
+        """
+        if mode not in GameState.EXPLORED_MODES:
+            raise Exception('Unknown explored tracking mode: ' + str(mode))
+        GameState.exploredMode = mode
+        GameState.getAndResetExplored()
+    setExploredMode = staticmethod(setExploredMode)
+
     def getAndResetExplored():
         tmp = GameState.explored.copy()
         GameState.explored = set()
+        GameState.exploredCount = 0
+        GameState.exploredDistinct = 0
+        if GameState.exploredMode == 'bounded':
+            GameState.exploredTable = bytearray(GameState.EXPLORED_TABLE_SIZE)
+        else:
+            GameState.exploredTable = None
         return tmp
     getAndResetExplored = staticmethod(getAndResetExplored)
 
+    def getExploredStats():
+        """
+        Returns the number of successors generated and the number of distinct
+        states seen (exact in 'full' mode, an estimate in 'bounded' mode and
+        None otherwise) since the last reset.
+        """
+        if GameState.exploredMode == 'full':
+            distinct = len(GameState.explored)
+        elif GameState.exploredMode == 'bounded':
+            distinct = GameState.exploredDistinct
+        else:
+            distinct = None
+        return {'generated': GameState.exploredCount, 'distinct': distinct}
+    getExploredStats = staticmethod(getExploredStats)
+
+    def _recordExplored( parent, child ):
+        GameState.exploredCount += 1
+        mode = GameState.exploredMode
+        if mode == 'bounded':
+            table = GameState.exploredTable
+            for state in (parent, child):
+                slot = hash(state) % len(table)
+                if not table[slot]:
+                    table[slot] = 1
+                    GameState.exploredDistinct += 1
+        elif mode == 'full':
+            GameState.explored.add(parent)
+            GameState.explored.add(child)
+    _recordExplored = staticmethod(_recordExplored)
+
     def getLegalActions( self, agentIndex=0 ):
         """
         Returns the legal actions for the agent specified.
@@ -92,38 +154,135 @@ class GameState:
         else:
             return GhostRules.getLegalActions( self, agentIndex )
 
-    def generateSuccessor( self, agentIndex, action):
+    def generateSuccessor( self, agentIndex, action, trusted=False ):
         """
         Returns the successor state after the specified agent takes the action.
+
+        Pass trusted=True when the action was taken from getLegalActions on
+        this state (as in a search), to skip checking its legality again.
         """
         # Check that successors exist
         if self.isWin() or self.isLose(): raise Exception('Can\'t generate a successor of a terminal state.')
 
         # Copy current state
         state = GameState(self)
+        prevAgents = ((s.configuration, s.scaredTimer) for s in self.data.agentStates)
+        state._advance( agentIndex, action, prevAgents, self.data.score, trusted )
 
+        if GameState.exploredMode is not None:
+            GameState._recordExplored(self, state)
+        return state
+
+    def generateSuccessors( self, agentIndex, noStop=False ):
+        """
+        Returns an (action, successor) pair for each legal action of the
+        agent, in getLegalActions order, or [] in a terminal state.  With
+        noStop, STOP is left out unless it is the only legal action.
+
+        Legality is computed once for all siblings, and the successors share
+        this state's food grid and capsule list rather than copying them, so
+        do not edit getFood() or getCapsules() of the returned states.
+        """
+        if self.isWin() or self.isLose(): return []
+
+        data = self.data
+        successors = []
+        actions = self.getLegalActions( agentIndex )
+        if noStop and len( actions ) > 1 and Directions.STOP in actions:
+            actions.remove( Directions.STOP )
+        for action in actions:
+            state = GameState.__new__( GameState )
+            state.data = GameStateData( data, shareBoard=True )
+            prevAgents = ((s.configuration, s.scaredTimer) for s in data.agentStates)
+            state._advance( agentIndex, action, prevAgents, data.score, True )
+
+            if GameState.exploredMode is not None:
+                GameState._recordExplored(self, state)
+            successors.append( (action, state) )
+        return successors
+
+    def applyMove( self, agentIndex, action, trusted=False ):
+        """
+        Applies the action to this state in place, exactly as generateSuccessor
+        would to a copy, and returns a token for undoMove.  Moves must be
+        undone in reverse order.  This lets a depth-first search walk the game
+        tree on a single state instead of copying it at every node.
+
+        Agent states are updated in place, so AgentState objects obtained
+        from this state (e.g. getGhostStates) change with it.  Explored
+        tracking does not record these moves.
+        """
+        if self.isWin() or self.isLose(): raise Exception('Can\'t apply a move to a terminal state.')
+
+        data = self.data
+        prevAgents = [(s.configuration, s.scaredTimer) for s in data.agentStates]
+        token = (prevAgents, data.food, data.numFood, data.foodPositions, data.capsules, data.score,
+                 data.scoreChange, data.zobrist, data._eaten, data._foodEaten, data._foodAdded,
+                 data._capsuleEaten, data._agentMoved)
+
+        # Reset the per-move fields that a fresh GameStateData would start with
+        data.scoreChange = 0
+        data._foodEaten = None
+        data._foodAdded = None
+        data._capsuleEaten = None
+        data._agentMoved = None
+        if agentIndex != 0:
+            data._eaten = data._eaten[:] # GhostRules.collide writes into it
+
+        self._advance( agentIndex, action, prevAgents, data.score, trusted )
+        return token
+
+    def undoMove( self, token ):
+        """
+        Restores the state to what it was before the applyMove that returned
+        token.
+        """
+        (prevAgents, food, numFood, foodPositions, capsules, score, scoreChange, zobrist,
+         eaten, foodEaten, foodAdded, capsuleEaten, agentMoved) = token
+        data = self.data
+        for agentState, (configuration, scaredTimer) in zip( data.agentStates, prevAgents ):
+            agentState.configuration = configuration
+            agentState.scaredTimer = scaredTimer
+        data.food = food
+        data.numFood = numFood
+        data.foodPositions = foodPositions
+        data.capsules = capsules
+        data.score = score
+        data.scoreChange = scoreChange
+        data.zobrist = zobrist
+        data._eaten = eaten
+        data._foodEaten = foodEaten
+        data._foodAdded = foodAdded
+        data._capsuleEaten = capsuleEaten
+        data._agentMoved = agentMoved
+        data._win = False
+        data._lose = False
+
+    def _advance( self, agentIndex, action, prevAgents, prevScore, trusted ):
+        """
+        Applies the effects of one move to this state in place.  Shared by
+        generateSuccessor, which calls it on a fresh copy, and applyMove.
+        """
         # Let agent's logic deal with its action's effects on the board
         if agentIndex == 0:  # Pacman is moving
-            state.data._eaten = [False for i in range(state.getNumAgents())]
-            PacmanRules.applyAction( state, action )
+            self.data._eaten = [False for i in range(self.getNumAgents())]
+            PacmanRules.applyAction( self, action, trusted )
         else:                # A ghost is moving
-            GhostRules.applyAction( state, action, agentIndex )
+            GhostRules.applyAction( self, action, agentIndex, trusted )
 
         # Time passes
         if agentIndex == 0:
-            state.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
+            self.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
         else:
-            GhostRules.decrementTimer( state.data.agentStates[agentIndex] )
+            GhostRules.decrementTimer( self.data.agentStates[agentIndex] )
 
         # Resolve multi-agent effects
-        GhostRules.checkDeath( state, agentIndex )
+        GhostRules.checkDeath( self, agentIndex )
 
         # Book keeping
-        state.data._agentMoved = agentIndex
-        state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
-        return state
+        self.data._agentMoved = agentIndex
+        self.data.score += self.data.scoreChange
+        self.data.updateZobrist( prevAgents, prevScore )
 
     def getLegalPacmanActions( self ):
         return self.getLegalActions( 0 )
@@ -175,7 +334,16 @@ class GameState:
         return self.data.capsules
 
     def getNumFood( self ):
-        return self.data.food.count()
+        return self.data.numFood
+
+    def getFoodPositions( self ):
+        """
+        Returns a frozenset of the (x,y) positions of the remaining food.
+
+        Unlike getFood().asList() this is maintained incrementally, so it is
+        free to call on every node of a search.
+        """
+        return self.data.foodPositions
 
     def getFood(self):
         """
@@ -207,6 +375,28 @@ class GameState:
     def hasWall(self, x, y):
         return self.data.layout.walls[x][y]
 
+    def getMoveTable(self):
+        """
+        Returns the layout's MoveTable (in game.py), whose getNeighbors gives
+        the open moves out of a position without probing the walls.
+        """
+        return self.data.layout.getMoveTable()
+
+    def getMazeDistances(self):
+        """
+        Returns the layout's MazeDistances (in mazeDistances.py): true maze
+        distances and shortest-path steps between any two open cells.
+        """
+        return self.data.layout.getMazeDistances()
+
+    def getLayoutAnalysis(self):
+        """
+        Returns the layout's LayoutAnalysis (in layoutAnalysis.py): dead-end
+        depths, tunnels, articulation points, and the starting food beyond
+        each bridge.
+        """
+        return self.data.layout.getLayoutAnalysis()
+
     def isLose( self ):
         return self.data._lose
 
@@ -232,6 +422,14 @@ class GameState:
         state.data = self.data.deepCopy()
         return state
 
+    def observationCopy( self ):
+        """
+        A deep copy that shares the (read-only) layout; see Game.observation.
+        """
+        state = GameState.__new__( GameState )
+        state.data = self.data.observationCopy()
+        return state
+
     def __eq__( self, other ):
         """
         Allows two states to be compared.
@@ -244,6 +442,13 @@ class GameState:
         """
         return hash( self.data )
 
+    def getHashKey( self ):
+        """
+        Returns the 64-bit Zobrist hash of the state.  It is maintained
+        incrementally, so it is O(1) and suitable as a transposition table key.
+        """
+        return self.data.zobrist
+
     def __str__( self ):
 
         return str(self.data)
@@ -335,15 +540,15 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions( state.getPacmanState().configuration, state.data.layout.walls )
+        return state.data.layout.getMoveTable().getPossibleActions( state.data.agentStates[0].configuration )
     getLegalActions = staticmethod( getLegalActions )
 
-    def applyAction( state, action ):
+    def applyAction( state, action, trusted=False ):
         """
-        Edits the state to reflect the results of the action.
+        Edits the state to reflect the results of the action.  A trusted
+        action is known to come from getLegalActions and is not re-checked.
         """
-        legal = PacmanRules.getLegalActions( state )
-        if action not in legal:
+        if not trusted and action not in PacmanRules.getLegalActions( state ):
             raise Exception("Illegal action " + str(action))
 
         pacmanState = state.data.agentStates[0]
@@ -365,17 +570,19 @@ class PacmanRules:
         # Eat food
         if state.data.food[x][y]:
             state.data.scoreChange += 10
-            state.data.food = state.data.food.copy()
-            state.data.food[x][y] = False
+            state.data.food = state.data.food.copyWith(x, y, False)
+            state.data.zobrist ^= zobristKey(ZOBRIST_FOOD, x, y)
             state.data._foodEaten = position
-            # TODO: cache numFood?
-            numFood = state.getNumFood()
-            if numFood == 0 and not state.data._lose:
+            state.data.numFood -= 1
+            state.data.foodPositions = state.data.foodPositions.difference((position,))
+            if state.data.numFood == 0 and not state.data._lose:
                 state.data.scoreChange += 500
                 state.data._win = True
         # Eat capsule
         if( position in state.getCapsules() ):
-            state.data.capsules.remove( position )
+            # Replace rather than edit the list, which applyMove may need to restore
+            state.data.capsules = [capsule for capsule in state.data.capsules if capsule != position]
+            state.data.zobrist ^= zobristKey(ZOBRIST_CAPSULE, x, y)
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range( 1, len( state.data.agentStates ) ):
@@ -393,19 +600,12 @@ class GhostRules:
         reach a dead end, but can turn 90 degrees at intersections.
         """
         conf = state.getGhostState( ghostIndex ).configuration
-        possibleActions = Actions.getPossibleActions( conf, state.data.layout.walls )
-        reverse = Actions.reverseDirection( conf.direction )
-        if Directions.STOP in possibleActions:
-            possibleActions.remove( Directions.STOP )
-        if reverse in possibleActions and len( possibleActions ) > 1:
-            possibleActions.remove( reverse )
-        return possibleActions
+        return state.data.layout.getMoveTable().getGhostActions( conf )
     getLegalActions = staticmethod( getLegalActions )
 
-    def applyAction( state, action, ghostIndex):
+    def applyAction( state, action, ghostIndex, trusted=False ):
 
-        legal = GhostRules.getLegalActions( state, ghostIndex )
-        if action not in legal:
+        if not trusted and action not in GhostRules.getLegalActions( state, ghostIndex ):
             raise Exception("Illegal ghost action " + str(action))
 
         ghostState = state.data.agentStates[ghostIndex]
@@ -418,7 +618,9 @@ class GhostRules:
     def decrementTimer( ghostState):
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint( ghostState.configuration.pos )
+            # Replace rather than edit the configuration, which is shared with the previous state
+            conf = ghostState.configuration
+            ghostState.configuration = Configuration( nearestPoint( conf.pos ), conf.direction )
         ghostState.scaredTimer = max( 0, timer - 1 )
     decrementTimer = staticmethod( decrementTimer )
 
@@ -527,6 +729,13 @@ def readCommand( argv ):
                       help='Turns off exception handling and timeouts during games', default=True)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--trackExplored', dest='trackExplored', type='choice', choices=['count', 'bounded', 'full'],
+                      help='Record explored states: count, bounded (fixed-size hash table) or full (every state)',
+                      default=None)
+    parser.add_option('--deepCopyObservations', action='store_true', dest='deepCopyObservations',
+                      help='Show agents a full deep copy of the state each turn, layout included', default=False)
+    parser.add_option('--workers', dest='workers', type='int',
+                      help=default('Number of processes to play games in parallel, each with fresh agents'), default=1)
 
     def vararg_callback(option, opt_str, value, parser):
         assert value is None
@@ -559,6 +768,9 @@ def readCommand( argv ):
     # Fix the random seed
     if options.fixRandomSeed: random.seed('cs188')
 
+    GameState.setExploredMode(options.trackExplored)
+    Game.deepCopyObservations = options.deepCopyObservations
+
     # # Choose a layout
     args['layout'] = options.layout
 
@@ -603,6 +815,16 @@ def readCommand( argv ):
     args['timeout'] = options.timeout
     args['outfile'] = options.outfile
 
+    if options.workers > 1:
+        if options.numTraining > 0 or options.record:
+            raise Exception('--workers cannot be combined with training games or recording')
+        args['workers'] = options.workers
+        args['seed'] = 'cs188' if options.fixRandomSeed else None
+        args['agentSpec'] = {'pacman': options.pacman, 'agentArgs': options.agentArgs,
+                             'ghost': options.ghost, 'numGhosts': options.numGhosts,
+                             'trackExplored': options.trackExplored,
+                             'deepCopyObservations': options.deepCopyObservations}
+
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
         print('Replaying recorded game %s.' % options.gameToReplay)
@@ -659,6 +881,11 @@ def replayGame( layout, actions, display ):
     display.finish()
 
 def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30, *args, **kwargs):
+    """
+    Plays the games, serially or with --workers across a pool of processes,
+    prints their summary and returns the gameResult dicts of the games that
+    were not training games.
+    """
     logger = logging.getLogger('root')
     logger.info('runGames')
 
@@ -676,6 +903,12 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
     else:
         layoutNames = [filename for filename in os.listdir(layout) if filename.endswith('.lay')]
 
+    if kwargs.get('workers', 1) > 1:
+        results = runGamesParallel( layoutNames, numGames, catchExceptions, timeout, kwargs['workers'],
+                                    kwargs['agentSpec'], kwargs.get('seed') )
+        summariseGames( results, kwargs.get('outfile') )
+        return results
+
     for i in range( numGames ):
         logger.info(str(i)+'/'+str(numGames))
         beQuiet = i < numTraining
@@ -706,35 +939,169 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
             pickle.dump(components, f)
             f.close()
 
-    if (numGames-numTraining) > 0:
-        scores = [game.state.getScore() for game in games]
-        move_histories = [game.moveHistory for game in games]
+    results = [gameResult( game, layoutNames[(numTraining + i) % len(layoutNames)], numTraining + i )
+               for i, game in enumerate( games )]
+    if GameState.exploredMode is not None and results:
+        results[-1]['explored'] = GameState.getExploredStats()
+    summariseGames( results, kwargs.get('outfile') )
+    return results
+
+def gameResult( game, layoutName, gameIndex ):
+    """
+    The outcome of a finished game as a small picklable dict, which is what
+    runGamesParallel workers send back and what summariseGames reports.
+    """
+    return {'game': gameIndex,
+            'layout': layoutName,
+            'score': game.state.getScore(),
+            'moveHistory': game.moveHistory,
+            'remainingFood': game.state.getNumFood(),
+            'win': game.state.isWin(),
+            'crashed': game.agentCrashed,
+            'peakMemoryKb': peakMemoryKb(),
+            'timing': [dict(summary, agent=type(agent).__name__)
+                       for agent, summary in zip(game.agents, game.getTimingReport())]}
+
+def peakMemoryKb():
+    """
+    The peak resident set size of this process so far in KiB, or None where
+    the resource module is unavailable (Windows).  In a worker process that
+    covers every game the worker has played, not just the latest.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak # bytes on macOS
+
+def summaryStats( results ):
+    """
+    The average score, number of wins, win rate and record of a non-empty
+    list of gameResult dicts.  A win with food still on the map is a draw.
+    """
+    scores = [result['score'] for result in results]
+    wins = [int(result['win']) for result in results]
+    
+    # Change win to draw if remaining food still on map
+    for i in range(len(wins)): 
+        if wins[i] and results[i]['remainingFood'] > 0: wins[i] = 2
+
+    return {'averageScore': sum(scores) / float(len(scores)),
+            'wins': wins.count(1),
+            'numGames': len(wins),
+            'winRate': wins.count(1)/ float(len(wins)),
+            'record': [ ['Loss', 'Win', 'Draw'][w] for w in wins]}
+
+def summariseGames( results, outfile ):
+    """
+    Prints and logs the usual end-of-run summary of a list of gameResult
+    dicts, and writes their timing report if an outfile was given.
+    """
+    logger = logging.getLogger('root')
+    if len(results) > 0:
+        stats = summaryStats( results )
+        scores = [result['score'] for result in results]
+        move_histories = [result['moveHistory'] for result in results]
         path_lengths = [len(move_history) for move_history in move_histories]
-        remaining_foods = [game.state.getNumFood() for game in games]
-        wins = [int(game.state.isWin()) for game in games]
-        
-        # Change win to draw if remaining food still on map
-        for i in range(len(wins)): 
-            if wins[i] and remaining_foods[i] > 0: wins[i] = 2
-
-        winRate = wins.count(1)/ float(len(wins))
+        remaining_foods = [result['remainingFood'] for result in results]
+        winRate = stats['winRate']
         print(f"Remaining Food: {', '.join([str(rf) for rf in remaining_foods])}")
         print('moveHistory: ' + str(move_histories))
         print('pathLength: ' + str(path_lengths))
         print('Average Score:', sum(scores) / float(len(scores)))
         print('Scores:       ', ', '.join([str(score) for score in scores]))
-        print('Win Rate:      %d/%d (%.2f)' % (wins.count(1), len(wins), winRate))
-        print('Record:       ', ', '.join([ ['Loss', 'Win', "Draw"][int(w)] for w in wins]))
+        print('Win Rate:      %d/%d (%.2f)' % (stats['wins'], stats['numGames'], winRate))
+        print('Record:       ', ', '.join(stats['record']))
+        explored = [result['explored'] for result in results if 'explored' in result]
+        if explored:
+            distinct = [stats['distinct'] for stats in explored]
+            print('Explored:      %d successors, %s distinct states' % (
+                sum(stats['generated'] for stats in explored), None if None in distinct else sum(distinct)))
 
         logger.info(f"Remaining Food: {', '.join([str(rf) for rf in remaining_foods])}")
         logger.info('moveHistory: ' + str(move_histories))
         logger.info('pathLength: ' + str(path_lengths))
         logger.info('Average Score: %.2f', sum(scores) / float(len(scores)))
         logger.info('Scores: ' + ', '.join([str(score) for score in scores]))
-        logger.info('Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate))
-        logger.info('Record:       ' + ', '.join([ ['Loss', 'Win', 'Draw'][int(w)] for w in wins]))
+        logger.info('Win Rate:      %d/%d (%.2f)' % (stats['wins'], stats['numGames'], winRate))
+        logger.info('Record:       ' + ', '.join(stats['record']))
+
+        if outfile:
+            writeTimingReport('logs/' + outfile + '.timing.json', results)
+
+def writeTimingReport( filename, results ):
+    """
+    Writes the outcome and per-agent move latency statistics of each game
+    (see gameResult and Game.getTimingReport) as JSON, next to the log of
+    the same name.
+    """
+    import json
+    report = []
+    for result in results:
+        entry = dict([(key, value) for key, value in result.items() if key not in ('moveHistory', 'timing')])
+        entry['pathLength'] = len(result['moveHistory'])
+        entry['agents'] = result['timing']
+        report.append(entry)
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=1)
+
+def gameSeed( seed, gameIndex ):
+    """
+    The random seed of game gameIndex of a parallel run: game 0 uses seed
+    itself, so that it plays exactly like a serial run with the same seed.
+    """
+    return seed if gameIndex == 0 else '%s-%d' % (seed, gameIndex)
 
-    return games
+def runGamesParallel( layoutNames, numGames, catchExceptions, timeout, workers, agentSpec, seed ):
+    """
+    Plays numGames games across a pool of worker processes and returns their
+    gameResult dicts in game order.  Each worker builds fresh agents from
+    agentSpec (see readCommand) for every game, so agents cannot carry
+    anything over from one game to the next, and seeds the random module
+    with gameSeed(seed, i).  Without a fixed seed one is drawn at random,
+    so a run can still be reproduced from the seed it logs.
+    """
+    import multiprocessing
+    logger = logging.getLogger('root')
+    if seed is None:
+        seed = random.randrange(2**32)
+    logger.info('runGamesParallel: %d games, %d workers, seed %s' % (numGames, workers, seed))
+
+    tasks = [(i, layoutNames[i % len(layoutNames)], gameSeed(seed, i), agentSpec, catchExceptions, timeout)
+             for i in range( numGames )]
+    with multiprocessing.Pool( workers ) as pool:
+        return pool.map( playGameTask, tasks, chunksize=1 )
+
+_workerAgentTypes = {}
+
+def playGameTask( task ):
+    """
+    Worker side of runGamesParallel: plays one headless game and returns its
+    gameResult.
+    """
+    import textDisplay
+    gameIndex, layoutName, seed, agentSpec, catchExceptions, timeout = task
+
+    random.seed(seed)
+    GameState.setExploredMode(agentSpec['trackExplored'])
+    Game.deepCopyObservations = agentSpec['deepCopyObservations']
+    for name in (agentSpec['pacman'], agentSpec['ghost']):
+        if name not in _workerAgentTypes:
+            _workerAgentTypes[name] = import_by_name("./agents", name)
+    pacman = _workerAgentTypes[agentSpec['pacman']](**parseAgentArgs(agentSpec['agentArgs']))
+    ghosts = [_workerAgentTypes[agentSpec['ghost']]( i+1 ) for i in range( agentSpec['numGhosts'] )]
+
+    layout = getLayout(layoutName)
+    if layout == None: raise Exception("The layout file cannot be found")
+    rules = ClassicGameRules(timeout)
+    rules.quiet = True
+    game = rules.newGame( layout, pacman, ghosts, textDisplay.NullGraphics(), True, catchExceptions )
+    game.run()
+    result = gameResult( game, layoutName, gameIndex )
+    if GameState.exploredMode is not None:
+        result['explored'] = GameState.getExploredStats()
+    return result
 
 if __name__ == '__main__':
     """
@@ -0,0 +1,41 @@
+from corridorGraph import CorridorGraph
+from logs.search_logger import log_function
+from pacman import GameState
+
+
+class corridor_problem:
+    """
+    The search problem of q1a_problem (reach a cell with food) over the
+    layout's CorridorGraph (corridorGraph.py) instead of single cells.
+
+    States are the graph's nodes: junctions, dead ends, Pacman's start and
+    the food, so the goal is always a node.  A successor walks a whole
+    corridor: its action is the tuple of directions along it and its cost is
+    the corridor's length, so a solver returns CorridorGraph.expandActions
+    of the path it finds.  Manhattan distance stays a consistent heuristic.
+    """
+    def __str__(self):
+        return str(self.__class__.__module__)
+
+    def __init__(self, gameState: GameState):
+        self.startingGameState: GameState = gameState
+        food = gameState.getFood()
+        self.graph = CorridorGraph(gameState.getWalls(), food, [gameState.getPacmanPosition()] + food.asList(),
+                                   gameState.getMoveTable())
+
+    @log_function
+    def getStartState(self):
+        return self.startingGameState.getPacmanPosition()
+
+    @log_function
+    def isGoalState(self, state):
+        x, y = state
+        return self.startingGameState.hasFood(x,y)
+
+    @log_function
+    def getSuccessors(self, state):
+        """
+        Returns (next node, the actions of the corridor, its length) for each
+        corridor leaving the node state.
+        """
+        return [(edge.end, edge.actions, edge.cost) for edge in self.graph.getEdges(state)]
@@ -3,7 +3,7 @@ import time
 from typing import Tuple
 
 import util
-from game import Actions, Agent, Directions
+from game import Agent
 from logs.search_logger import log_function
 from pacman import GameState
 
@@ -26,6 +26,7 @@ class q1b_problem:
         goal: A position in the gameState
         """
         self.startingGameState: GameState = gameState
+        self.moveTable = gameState.getMoveTable()
 
     @log_function
     def getStartState(self):
@@ -52,13 +53,8 @@ class q1b_problem:
         """
         "*** YOUR CODE HERE ***"
         successors = []
-        for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
-            x, y = state
-            dx, dy = Actions.directionToVector(action)
-            next_x, next_y = int(x + dx), int(y + dy)
-
-            if not self.startingGameState.hasWall(next_x, next_y):
-                successors.append(((next_x, next_y), action, 1))
+        for action, next_position in self.moveTable.getNeighbors(state):
+            successors.append((next_position, action, 1))
 
         return successors
 
@@ -3,7 +3,7 @@ import time
 from typing import Tuple
 
 import util
-from game import Actions, Agent, Directions
+from game import Agent
 from logs.search_logger import log_function
 from pacman import GameState
 
@@ -26,6 +26,7 @@ class q1c_problem:
         goal: A position in the gameState
         """
         self.startingGameState: GameState = gameState
+        self.moveTable = gameState.getMoveTable()
 
     @log_function
     def getStartState(self):
@@ -54,14 +55,9 @@ class q1c_problem:
         successors = []
         pacman_position, food_positions = state
         
-        for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
-            x, y = pacman_position
-            dx, dy = Actions.directionToVector(action)
-            next_x, next_y = int(x + dx), int(y + dy)
-            
-            if not self.startingGameState.hasWall(next_x, next_y):
-                new_food_positions = tuple(pos for pos in food_positions if pos != (next_x, next_y))
-                successors.append((((next_x, next_y), new_food_positions), action, 1))
+        for action, next_position in self.moveTable.getNeighbors(pacman_position):
+            new_food_positions = tuple(pos for pos in food_positions if pos != next_position)
+            successors.append(((next_position, new_food_positions), action, 1))
         
         return successors
 
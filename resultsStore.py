@@ -0,0 +1,351 @@
+"""
+A SQLite history of evaluator runs, and regression reports between them.
+
+Every run of evaluator.py is stored with its git revision and one row per
+(question, layout) job: score, win/draw/loss counts, path length, node
+expansions, wall time and peak memory.  Two runs, or two groups of runs,
+can then be compared:
+
+USAGE:      python resultsStore.py BASELINE [CURRENT] [--store PATH]
+EXAMPLES:   python resultsStore.py previous
+            python resultsStore.py 3f2a1bc latest
+
+A run is selected by its id, 'latest', 'previous', a label or a git revision
+prefix.  A label or revision selects every run carrying it, which gives
+repeated measurements to test against.
+
+evaluator.py also keeps a cache of job results here, keyed by a hash of each
+job's inputs, so that jobs nothing has changed for are not run again.  A run
+stores the results it reused marked as cached: they count towards the
+quality metrics, but are not measurements of the run, so the performance
+metrics only test the jobs that were actually run.
+"""
+import json
+import math
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from optparse import OptionParser
+
+DEFAULT_STORE = 'evaluations.sqlite'
+
+# metric: (column, which direction is better, kind)
+# 'quality' metrics are deterministic under fixed seeds, so any change to a
+# layout is reported; 'performance' metrics are noisy and are tested.
+METRICS = {
+    'score': ('score', 'higher', 'quality'),
+    'wins': ('wins', 'higher', 'quality'),
+    'path length': ('path_length', 'lower', 'quality'),
+    'expansions': ('expansions', 'lower', 'performance'),
+    'wall time': ('wall_time', 'lower', 'performance'),
+    'peak memory': ('peak_memory_kb', 'lower', 'performance'),
+}
+
+# A performance change to one layout is flagged when it exceeds this
+# relative amount and, with at least MIN_SAMPLES measurements per side, a
+# Welch test at SIGNIFICANCE; with fewer samples the threshold alone decides.
+RELATIVE_THRESHOLD = 0.10
+MIN_SAMPLES = 3
+SIGNIFICANCE = 0.05
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started TEXT NOT NULL,
+    revision TEXT,
+    label TEXT,
+    command TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    question TEXT NOT NULL,
+    layout TEXT NOT NULL,
+    solver TEXT,
+    score REAL,
+    wins INTEGER,
+    draws INTEGER,
+    losses INTEGER,
+    path_length REAL,
+    expansions INTEGER,
+    wall_time REAL,
+    peak_memory_kb INTEGER,
+    mode TEXT,
+    cached INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS results_run ON results(run_id);
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    record TEXT NOT NULL,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+);
+"""
+
+RESULT_COLUMNS = ['question', 'layout', 'solver', 'score', 'wins', 'draws', 'losses', 'path_length',
+                  'expansions', 'wall_time', 'peak_memory_kb', 'mode']
+
+# Columns of results added after the first version of the schema, with
+# their types, for stores made before them
+ADDED_COLUMNS = [('mode', 'TEXT'), ('cached', 'INTEGER NOT NULL DEFAULT 0')]
+
+
+# Files every evaluator run rewrites, which do not make a run dirty (glob
+# patterns from the top of the checkout)
+GENERATED_PATHS = ['logs/*.log', 'logs/*.timing.json']
+
+
+def gitRevision():
+    """
+    The current git revision, suffixed with -dirty when tracked files outside
+    GENERATED_PATHS have local changes, or None outside a git checkout.
+    """
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                  capture_output=True, check=True, text=True).stdout.strip()
+        changes = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no', '--', ':/'] +
+                                 [':(top,glob,exclude)' + path for path in GENERATED_PATHS],
+                                 capture_output=True, check=True, text=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision + ('-dirty' if changes.strip() else '')
+
+
+class ResultsStore:
+    """
+    The evaluation history in one SQLite file.
+    """
+    def __init__(self, path=DEFAULT_STORE):
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        existing = [row['name'] for row in self.connection.execute('PRAGMA table_info(results)')]
+        for column, columnType in ADDED_COLUMNS:
+            if column not in existing:
+                self.connection.execute('ALTER TABLE results ADD COLUMN %s %s' % (column, columnType))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def startRun(self, label=None, command=None, revision=None):
+        """
+        Records a new run and returns its id.
+        """
+        if revision is None:
+            revision = gitRevision()
+        cursor = self.connection.execute(
+            'INSERT INTO runs (started, revision, label, command) VALUES (?, ?, ?, ?)',
+            (time.strftime('%Y-%m-%d %H:%M:%S'), revision, label, command))
+        self.connection.commit()
+        return cursor.lastrowid
+
+    def addResult(self, runId, record, cached=False):
+        """
+        Stores one job of a run; record maps RESULT_COLUMNS to values, and
+        missing columns are stored as NULL.  cached marks a record reused
+        from the cache rather than measured by this run.
+        """
+        self.connection.execute(
+            'INSERT INTO results (run_id, cached, %s) VALUES (?, ?, %s)' % (
+                ', '.join(RESULT_COLUMNS), ', '.join('?' * len(RESULT_COLUMNS))),
+            [runId, int(cached)] + [record.get(column) for column in RESULT_COLUMNS])
+        self.connection.commit()
+
+    def getCached(self, key):
+        """
+        The job record cached under key, or None.
+        """
+        row = self.connection.execute('SELECT record FROM cache WHERE key = ?', (key,)).fetchone()
+        return json.loads(row['record']) if row else None
+
+    def putCached(self, key, record):
+        """
+        Caches a job record under key, or marks an existing entry as used.
+        """
+        now = time.time()
+        self.connection.execute(
+            'INSERT INTO cache (key, record, created, used) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET record = excluded.record, used = excluded.used',
+            (key, json.dumps(record), now, now))
+        self.connection.commit()
+
+    def evictCache(self, maxAge=None, maxEntries=None):
+        """
+        Drops cache entries unused for more than maxAge seconds, then all but
+        the maxEntries most recently used.  Returns the number dropped.
+        """
+        evicted = 0
+        if maxAge is not None:
+            evicted += self.connection.execute('DELETE FROM cache WHERE used < ?', (time.time() - maxAge,)).rowcount
+        if maxEntries is not None:
+            evicted += self.connection.execute(
+                'DELETE FROM cache WHERE key NOT IN (SELECT key FROM cache ORDER BY used DESC LIMIT ?)',
+                (maxEntries,)).rowcount
+        self.connection.commit()
+        return evicted
+
+    def selectRuns(self, selector):
+        """
+        The ids of the runs a selector names (see the module docstring),
+        oldest first.
+        """
+        runs = [row['id'] for row in self.connection.execute('SELECT id FROM runs ORDER BY id')]
+        if selector == 'latest':
+            return runs[-1:]
+        if selector == 'previous':
+            return runs[-2:-1]
+        if selector.isdigit() and int(selector) in runs:
+            return [int(selector)]
+        return [row['id'] for row in self.connection.execute(
+            'SELECT id FROM runs WHERE label = ? OR revision LIKE ? ORDER BY id', (selector, selector + '%'))]
+
+    def getResults(self, runIds):
+        """
+        {(question, layout): [row, ...]} over the given runs.
+        """
+        results = {}
+        query = 'SELECT * FROM results WHERE run_id IN (%s)' % ', '.join('?' * len(runIds))
+        for row in self.connection.execute(query, runIds):
+            results.setdefault((row['question'], row['layout']), []).append(row)
+        return results
+
+    def describeRuns(self, runIds):
+        rows = self.connection.execute('SELECT * FROM runs WHERE id IN (%s) ORDER BY id' % ', '.join('?' * len(runIds)),
+                                       runIds)
+        return ', '.join('#%d %s (%s%s)' % (row['id'], row['started'], row['revision'],
+                                            ', ' + row['label'] if row['label'] else '') for row in rows)
+
+
+def welchPValue(baseline, current):
+    """
+    Two-sided p-value of Welch's t-test that two samples share a mean, with
+    the t distribution mapped onto the normal one (Abramowitz and Stegun
+    26.7.8), which is close enough for flagging regressions.
+    """
+    meanB, meanC = statistics.mean(baseline), statistics.mean(current)
+    varB, varC = statistics.variance(baseline) / len(baseline), statistics.variance(current) / len(current)
+    if varB + varC == 0:
+        return 0.0 if meanB != meanC else 1.0
+    t = abs(meanC - meanB) / math.sqrt(varB + varC)
+    df = (varB + varC) ** 2 / (varB ** 2 / (len(baseline) - 1) + varC ** 2 / (len(current) - 1))
+    z = t * (1 - 1 / (4 * df)) / math.sqrt(1 + t * t / (2 * df))
+    return 2 * statistics.NormalDist().cdf(-z)
+
+
+def signTestPValue(worse, better):
+    """
+    Two-sided exact binomial p-value of seeing worse-versus-better splits at
+    least this lopsided among paired layouts if neither direction is favoured.
+    """
+    n = worse + better
+    if n == 0:
+        return 1.0
+    tail = sum(math.comb(n, k) for k in range(max(worse, better), n + 1)) / 2.0 ** n
+    return min(1.0, 2 * tail)
+
+
+def comparableRows(metric, kind, baseline, current):
+    """
+    The groups of one layout's baseline and current rows to compare a metric
+    over, as (label, baseline rows, current rows).  Quality metrics compare
+    all rows.  Performance metrics are only compared between rows measured
+    the same way (the mode column: a pacman.py subprocess per job, or a
+    worker pool), since the two differ in what they include, and leave out
+    cached rows, which repeat an earlier run's measurement.
+    """
+    if kind != 'performance':
+        return [(metric, baseline, current)]
+    baseline = [row for row in baseline if not row['cached']]
+    current = [row for row in current if not row['cached']]
+    groups = []
+    for mode in sorted(set(row['mode'] for row in baseline) & set(row['mode'] for row in current), key=str):
+        groups.append((metric if mode is None else '%s (%s)' % (metric, mode),
+                       [row for row in baseline if row['mode'] == mode],
+                       [row for row in current if row['mode'] == mode]))
+    return groups
+
+
+def compareRuns(store, baselineIds, currentIds):
+    """
+    Compares every layout measured in both groups of runs, metric by metric
+    (see comparableRows).  Returns (changes, suite): changes lists (question, layout, metric,
+    baseline mean, current mean, relative change, verdict) for every flagged
+    layout, and suite gives, per metric, (layouts worse, layouts better,
+    sign-test p-value, verdict) over all paired layouts.
+    """
+    baseline, current = store.getResults(baselineIds), store.getResults(currentIds)
+    changes = []
+    suite = {}
+    for metric, (column, better, kind) in METRICS.items():
+        worse = improved = 0
+        for key in sorted(set(baseline) & set(current)):
+            for label, beforeRows, afterRows in comparableRows(metric, kind, baseline[key], current[key]):
+                before = [row[column] for row in beforeRows if row[column] is not None]
+                after = [row[column] for row in afterRows if row[column] is not None]
+                if not before or not after:
+                    continue
+                meanBefore, meanAfter = statistics.mean(before), statistics.mean(after)
+                if meanAfter == meanBefore:
+                    continue
+                isWorse = (meanAfter > meanBefore) == (better == 'lower')
+                if isWorse:
+                    worse += 1
+                else:
+                    improved += 1
+
+                relative = (meanAfter - meanBefore) / abs(meanBefore) if meanBefore else math.inf
+                if kind == 'performance':
+                    if abs(relative) < RELATIVE_THRESHOLD:
+                        continue
+                    if len(before) >= MIN_SAMPLES and len(after) >= MIN_SAMPLES and \
+                            welchPValue(before, after) >= SIGNIFICANCE:
+                        continue
+                changes.append(key + (label, meanBefore, meanAfter, relative, 'REGRESSION' if isWorse else 'improved'))
+
+        p = signTestPValue(worse, improved)
+        verdict = ''
+        if p < SIGNIFICANCE:
+            verdict = 'REGRESSION' if worse > improved else 'improved'
+        suite[metric] = (worse, improved, p, verdict)
+    return changes, suite
+
+
+def printComparison(store, baselineIds, currentIds):
+    """
+    Prints the report of compareRuns and returns the number of regressions
+    flagged.
+    """
+    changes, suite = compareRuns(store, baselineIds, currentIds)
+    print('Baseline: ' + store.describeRuns(baselineIds))
+    print('Current:  ' + store.describeRuns(currentIds))
+    print()
+    print('%-4s %-32s %-24s %12s %12s %9s  %s' % ('', 'layout', 'metric', 'baseline', 'current', 'change', ''))
+    for question, layout, metric, before, after, relative, verdict in changes:
+        print('%-4s %-32s %-24s %12.2f %12.2f %8.1f%%  %s' % (question, layout.split('/')[-1], metric, before, after,
+                                                             100 * relative, verdict))
+    if not changes:
+        print('No per-layout changes.')
+    print()
+    print('%-12s %6s %6s %8s' % ('suite', 'worse', 'better', 'p'))
+    for metric, (worse, improved, p, verdict) in suite.items():
+        print('%-12s %6d %6d %8.3f  %s' % (metric, worse, improved, p, verdict))
+    return sum(1 for change in changes if change[-1] == 'REGRESSION') + \
+        sum(1 for stats in suite.values() if stats[-1] == 'REGRESSION')
+
+
+if __name__ == '__main__':
+    parser = OptionParser(__doc__)
+    parser.add_option('--store', dest='store', help='The results database', default=DEFAULT_STORE)
+    options, selectors = parser.parse_args(sys.argv[1:])
+    if len(selectors) not in (1, 2):
+        parser.error('Expected BASELINE [CURRENT]')
+
+    store = ResultsStore(options.store)
+    baselineIds = store.selectRuns(selectors[0])
+    currentIds = store.selectRuns(selectors[1] if len(selectors) == 2 else 'latest')
+    if not baselineIds or not currentIds:
+        raise Exception('No runs match ' + ' / '.join(selectors))
+    regressions = printComparison(store, baselineIds, currentIds)
+    sys.exit(1 if regressions else 0)
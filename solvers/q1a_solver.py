@@ -21,20 +21,26 @@ def q1a_solver(problem: q1a_problem):
 # DO NOT MODIFY END #
 #-------------------#
 
+from corridorGraph import CorridorGraph
+
 class AStarData:
     # YOUR CODE HERE
-    def __init__(self):
+    def __init__(self, frontier_type=util.BucketQueue):
         # create frontier, actual cost (gn) and path 
         # self.frontier = []
-        self.frontier = util.PriorityQueue() #expands lowest cost node first
+        # Step costs are 1 and the heuristic is an integer Manhattan distance,
+        # so f-costs are small integers and a bucket queue can replace the heap
+        self.frontier = frontier_type() #expands lowest cost node first
         self.explored = set()
         self.g_cost = {}
         self.path = {}
+        self.analysis = None  # LayoutAnalysis, to skip dead ends without food
 
 
-def astar_initialise(problem: q1a_problem):
+def astar_initialise(problem: q1a_problem, frontier_type=util.BucketQueue):
     # YOUR CODE HERE
-    astarData = AStarData()
+    astarData = AStarData(frontier_type)
+    astarData.analysis = problem.startingGameState.getLayoutAnalysis()
     start_state = problem.getStartState()
     
     # Get the goal state (first food dot) and store it
@@ -72,15 +78,16 @@ def astar_loop_body(problem: q1a_problem, astarData: AStarData):
             prev_state, action = astarData.path[state]
             path.append(action)
             state = prev_state
-        return True, path[::-1]
+        # Corridor problems step along whole corridors, one tuple of actions each
+        return True, CorridorGraph.expandActions(path[::-1])
     
     # Add to explored set
     astarData.explored.add(current_state)
     
     # Expand current state
     for successor, action, step_cost in problem.getSuccessors(current_state):
-        # Skip if already explored
-        if successor in astarData.explored:
+        # Skip if already explored, or across a bridge with no food beyond
+        if successor in astarData.explored or astarData.analysis.getFoodBeyond(current_state, successor) == 0:
             continue
         
         # Calculate new g(n)
@@ -21,40 +21,49 @@ def q1b_solver(problem: q1b_problem):
 # DO NOT MODIFY END #
 #-------------------#
 
+from corridorGraph import CorridorGraph
+
 
 class AStarData:
     def __init__(self):
-        self.frontier = util.PriorityQueue()  # Expands lowest cost node first
+        self.frontier = util.IndexedPriorityQueue()  # States by f-cost, lowest first, O(log n) update
         self.explored = set()
         self.g_cost = {}
         self.path = {}
         self.target_food = None  # Store the target food dot
         self.frontier_nodes = set()  # Track nodes in frontier
+        self.analysis = None  # LayoutAnalysis, to skip dead ends without food
 
 def is_reachable(start, goal, game_state):
     """
-    Check if a goal position is reachable from the start position using BFS.
+    Check if a goal position is reachable from the start position, by its
+    maze distance.
     """
-    queue = util.Queue()
-    queue.push(start)
-    visited = set([start])
-    
+    return game_state.getMazeDistances().getDistance(start, goal) != float('inf')
+
+def grid_bfs(start, walls):
+    """
+    Breadth-first traversal of the open cells reachable from start, yielding
+    integer cell ids (see Grid.cellId) in visiting order.  Neighbours are
+    expanded north, east, south, west.  The frontier is a preallocated ring
+    buffer, since every cell is enqueued at most once.
+    """
+    height = walls.height
+    queue = util.RingQueue(walls.width * height)
+    # Walls start out marked as visited so each neighbour needs a single check
+    visited = bytearray(b''.join(bytes(walls[x]) for x in range(walls.width)))
+    start_id = walls.cellId(*start)
+    queue.push(start_id)
+    visited[start_id] = 1
+
     while not queue.isEmpty():
-        pos = queue.pop()
-        
-        if pos == goal:
-            return True
-            
-        x, y = pos
-        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:  # Four directions
-            next_x, next_y = x + dx, y + dy
-            next_pos = (next_x, next_y)
-            
-            if not game_state.hasWall(next_x, next_y) and next_pos not in visited:
-                queue.push(next_pos)
-                visited.add(next_pos)
-    
-    return False
+        cell = queue.pop()
+        yield cell
+
+        for next_cell in (cell + 1, cell + height, cell - 1, cell - height):  # Four directions
+            if not visited[next_cell]:
+                queue.push(next_cell)
+                visited[next_cell] = 1
 
 def count_surrounding_walls(pos, game_state):
     """
@@ -77,31 +86,21 @@ def find_reachable_food(start, food_list, game_state):
     Find all reachable food dots from the start position using a single BFS.
     Returns a list of reachable food positions.
     """
-    queue = util.Queue()
-    queue.push(start)
-    visited = set([start])
+    walls = game_state.getWalls()
+    food = set(food_list)
     reachable_food = []
-    
-    while not queue.isEmpty():
-        pos = queue.pop()
-        
+
+    for cell in grid_bfs(start, walls):
         # Check if this position has food
-        if pos in food_list:
+        pos = walls.cellPosition(cell)
+        if pos in food:
             reachable_food.append(pos)
-            
-        x, y = pos
-        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:  # Four directions
-            next_x, next_y = x + dx, y + dy
-            next_pos = (next_x, next_y)
-            
-            if not game_state.hasWall(next_x, next_y) and next_pos not in visited:
-                queue.push(next_pos)
-                visited.add(next_pos)
-    
+
     return reachable_food
 
 def astar_initialise(problem: q1b_problem):
     astarData = AStarData()
+    astarData.analysis = problem.startingGameState.getLayoutAnalysis()
     start_state = problem.getStartState()
     food_list = problem.startingGameState.getFood().asList()
     
@@ -133,7 +132,7 @@ def astar_initialise(problem: q1b_problem):
     
     astarData.g_cost[start_state] = 0
     h_cost = astar_heuristic(start_state, astarData.target_food)
-    astarData.frontier.push((start_state, 0), h_cost)
+    astarData.frontier.push(start_state, h_cost)
     astarData.frontier_nodes.add(start_state)  # Add start state to frontier tracking
     
     return astarData
@@ -142,7 +141,9 @@ def astar_loop_body(problem: q1b_problem, astarData: AStarData):
     if astarData.frontier.isEmpty():
         return True, []
     
-    current_state, current_g_cost = astarData.frontier.pop()
+    # One frontier entry per state, so its g-cost is the best found so far
+    current_state = astarData.frontier.pop()
+    current_g_cost = astarData.g_cost[current_state]
     # Safely remove from frontier tracking if it exists
     if current_state in astarData.frontier_nodes:
         astarData.frontier_nodes.remove(current_state)
@@ -154,12 +155,15 @@ def astar_loop_body(problem: q1b_problem, astarData: AStarData):
             prev_state, action = astarData.path[state]
             path.append(action)
             state = prev_state
-        return True, path[::-1]
+        # Corridor problems step along whole corridors, one tuple of actions each
+        return True, CorridorGraph.expandActions(path[::-1])
     
     astarData.explored.add(current_state)
     
     # Check if current position is a dead end
-    successors = list(problem.getSuccessors(current_state))
+    # Steps across a bridge with no food beyond can never lead to a goal
+    successors = [successor for successor in problem.getSuccessors(current_state)
+                  if astarData.analysis.getFoodBeyond(current_state, successor[0]) != 0]
     if len(successors) == 1:
         # Dead end - only one way to go
         successor, action, step_cost = successors[0]
@@ -171,9 +175,9 @@ def astar_loop_body(problem: q1b_problem, astarData: AStarData):
                 f_cost = new_g_cost + astar_heuristic(successor, astarData.target_food)
                 
                 if successor in astarData.frontier_nodes:
-                    astarData.frontier.update((successor, new_g_cost), f_cost)
+                    astarData.frontier.update(successor, f_cost)
                 else:
-                    astarData.frontier.push((successor, new_g_cost), f_cost)
+                    astarData.frontier.push(successor, f_cost)
                     astarData.frontier_nodes.add(successor)
         return False, []
     
@@ -221,9 +225,9 @@ def astar_loop_body(problem: q1b_problem, astarData: AStarData):
             
             # Always use update if node is in frontier
             if successor in astarData.frontier_nodes:
-                astarData.frontier.update((successor, new_g_cost), f_cost)
+                astarData.frontier.update(successor, f_cost)
             else:
-                astarData.frontier.push((successor, new_g_cost), f_cost)
+                astarData.frontier.push(successor, f_cost)
                 astarData.frontier_nodes.add(successor)
     
     return False, []
@@ -26,12 +26,17 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
+import ast
 import glob
 import heapq
 import importlib.util
 import inspect
+import json
+import os
 import random
 import sys
+from array import array
+from collections import deque
 from io import BytesIO
 
 
@@ -154,11 +159,11 @@ class Stack:
 class Queue:
     "A container with a first-in-first-out (FIFO) queuing policy."
     def __init__(self):
-        self.list = []
+        self.list = deque()
 
     def push(self,item):
         "Enqueue the 'item' into the queue"
-        self.list.insert(0,item)
+        self.list.appendleft(item)
 
     def pop(self):
         """
@@ -171,6 +176,44 @@ class Queue:
         "Returns true if the queue is empty"
         return len(self.list) == 0
 
+class RingQueue:
+    """
+      A fixed-capacity FIFO queue of non-negative integers backed by a
+      preallocated array used as a ring buffer.  Intended as a BFS frontier
+      over integer cell ids (see Grid.cellId), where each cell is enqueued at
+      most once and the capacity is simply the number of cells.
+    """
+    def __init__(self, capacity):
+        self.buffer = array('l', bytes(array('l').itemsize * max(capacity, 1)))
+        self.capacity = max(capacity, 1)
+        self.head = 0
+        self.size = 0
+
+    def push(self, item):
+        "Enqueue the integer 'item' into the queue"
+        if self.size == self.capacity:
+            raise IndexError('push onto a full RingQueue')
+        self.buffer[(self.head + self.size) % self.capacity] = item
+        self.size += 1
+
+    def pop(self):
+        "Dequeue the earliest enqueued item still in the queue"
+        if self.size == 0:
+            raise IndexError('pop from an empty RingQueue')
+        item = self.buffer[self.head]
+        self.head = (self.head + 1) % self.capacity
+        self.size -= 1
+        return item
+
+    def isEmpty(self):
+        "Returns true if the queue is empty"
+        return self.size == 0
+
+    def clear(self):
+        "Empties the queue without releasing its buffer"
+        self.head = 0
+        self.size = 0
+
 class PriorityQueue:
     """
       Implements a priority queue data structure. Each inserted item
@@ -209,6 +252,185 @@ class PriorityQueue:
         else:
             self.push(item, priority)
 
+class IndexedPriorityQueue:
+    """
+      A drop-in replacement for PriorityQueue that keeps a map from each
+      item to its slot in the heap.  This makes update() a true O(log n)
+      decrease-key instead of a linear scan followed by a heapify.
+
+      Items must be hashable and are unique within the queue: pushing an
+      item that is already queued re-prioritises it.  Ties are broken by
+      insertion order, so items come out in exactly the same order as from
+      PriorityQueue.  remove() is lazy: the heap entry is marked dead and
+      skipped by pop(), and dead entries are compacted away once they make
+      up half of the heap.
+    """
+    _REMOVED = object()
+
+    def __init__(self):
+        self.heap = []      # entries are [priority, count, item]
+        self.index = {}     # item -> position of its entry in self.heap
+        self.count = 0
+        self.numRemoved = 0
+
+    def push(self, item, priority):
+        if item in self.index:
+            self._reprioritise(self.index[item], priority)
+            return
+        entry = [priority, self.count, item]
+        self.count += 1
+        self.heap.append(entry)
+        self.index[item] = len(self.heap) - 1
+        self._siftUp(len(self.heap) - 1)
+
+    def pop(self):
+        while self.heap:
+            entry = self._popEntry()
+            if entry[2] is IndexedPriorityQueue._REMOVED:
+                self.numRemoved -= 1
+                continue
+            del self.index[entry[2]]
+            return entry[2]
+        raise IndexError('pop from an empty priority queue')
+
+    def isEmpty(self):
+        return len(self.index) == 0
+
+    def update(self, item, priority):
+        # Same contract as PriorityQueue.update: lower the priority of a queued
+        # item, ignore a higher one, and push the item if it is not queued.
+        if item not in self.index:
+            self.push(item, priority)
+            return
+        pos = self.index[item]
+        if self.heap[pos][0] <= priority:
+            return
+        self.heap[pos][0] = priority
+        self._siftUp(pos)
+
+    def remove(self, item):
+        "Lazily removes 'item' from the queue.  Does nothing if it is not queued."
+        pos = self.index.pop(item, None)
+        if pos is None:
+            return
+        self.heap[pos][2] = IndexedPriorityQueue._REMOVED
+        self.numRemoved += 1
+        if 2 * self.numRemoved > len(self.heap):
+            self._compact()
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def _reprioritise(self, pos, priority):
+        oldPriority = self.heap[pos][0]
+        self.heap[pos][0] = priority
+        if priority < oldPriority:
+            self._siftUp(pos)
+        else:
+            self._siftDown(pos)
+
+    def _popEntry(self):
+        last = self.heap.pop()
+        if not self.heap:
+            return last
+        top = self.heap[0]
+        self._place(last, 0)
+        self._siftDown(0)
+        return top
+
+    def _place(self, entry, pos):
+        self.heap[pos] = entry
+        if entry[2] is not IndexedPriorityQueue._REMOVED:
+            self.index[entry[2]] = pos
+
+    def _siftUp(self, pos):
+        heap = self.heap
+        entry = heap[pos]
+        key = (entry[0], entry[1])
+        while pos > 0:
+            parentPos = (pos - 1) >> 1
+            parent = heap[parentPos]
+            if key < (parent[0], parent[1]):
+                self._place(parent, pos)
+                pos = parentPos
+            else:
+                break
+        self._place(entry, pos)
+
+    def _siftDown(self, pos):
+        heap = self.heap
+        size = len(heap)
+        entry = heap[pos]
+        key = (entry[0], entry[1])
+        while True:
+            childPos = 2 * pos + 1
+            if childPos >= size:
+                break
+            rightPos = childPos + 1
+            if rightPos < size and (heap[rightPos][0], heap[rightPos][1]) < (heap[childPos][0], heap[childPos][1]):
+                childPos = rightPos
+            child = heap[childPos]
+            if (child[0], child[1]) < key:
+                self._place(child, pos)
+                pos = childPos
+            else:
+                break
+        self._place(entry, pos)
+
+    def _compact(self):
+        self.heap = [entry for entry in self.heap if entry[2] is not IndexedPriorityQueue._REMOVED]
+        heapq.heapify(self.heap)
+        self.index = dict((entry[2], pos) for pos, entry in enumerate(self.heap))
+        self.numRemoved = 0
+
+class BucketQueue:
+    """
+      A monotone bucket (Dial's) priority queue for small non-negative
+      integer priorities, such as f-costs in a unit-cost grid A* with an
+      integer heuristic.  Items are kept in one bucket per priority and a
+      cursor walks the buckets upwards, so push and pop are O(1) amortised
+      with no comparisons and no tie-break counters.
+
+      Items of equal priority come out first-in-first-out (the same order as
+      PriorityQueue) or, with lifo=True, last-in-first-out.  Pushing below
+      the cursor is allowed and simply moves the cursor back.
+    """
+    def __init__(self, lifo=False):
+        self.buckets = []
+        self.cursor = 0
+        self.size = 0
+        self.lifo = lifo
+
+    def push(self, item, priority):
+        if priority < 0 or priority != int(priority):
+            raise ValueError('BucketQueue priorities must be non-negative integers, got %s' % priority)
+        priority = int(priority)
+        while len(self.buckets) <= priority:
+            self.buckets.append(deque())
+        self.buckets[priority].append(item)
+        self.size += 1
+        if priority < self.cursor:
+            self.cursor = priority
+
+    def pop(self):
+        if self.size == 0:
+            raise IndexError('pop from an empty BucketQueue')
+        buckets = self.buckets
+        cursor = self.cursor
+        while not buckets[cursor]:
+            cursor += 1
+        self.cursor = cursor
+        self.size -= 1
+        if self.lifo:
+            return buckets[cursor].pop()
+        return buckets[cursor].popleft()
+
+    def isEmpty(self):
+        return self.size == 0
+
 class PriorityQueueWithFunction(PriorityQueue):
     """
     Implements a priority queue with the same push/pop signature of the
@@ -622,6 +844,11 @@ class OutOfActions(Exception):
     pass
 
 class TimeoutFunction:
+    """
+    Wraps function so that calls raise TimeoutFunctionException after
+    timeout seconds, which may be fractional.  A timeout that has already
+    run out (<= 0) raises without calling function.
+    """
     def __init__(self, function, timeout):
         self.timeout = timeout
         self.function = function
@@ -630,25 +857,48 @@ class TimeoutFunction:
         raise TimeoutFunctionException()
 
     def __call__(self, *args, **keyArgs):
+        if self.timeout <= 0:
+            self.handle_timeout(None, None)
         # If we have SIGALRM signal, use it to cause an exception if and
         # when this function runs too long.  Otherwise check the time taken
         # after the method has returned, and throw an exception then.
         if hasattr(signal, 'SIGALRM'):
             old = signal.signal(signal.SIGALRM, self.handle_timeout)
-            signal.alarm(self.timeout)
+            signal.setitimer(signal.ITIMER_REAL, self.timeout)
             try:
                 result = self.function(*args, **keyArgs)
             finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
                 signal.signal(signal.SIGALRM, old)
-            signal.alarm(0)
         else:
-            startTime = time.time()
+            startTime = time.monotonic()
             result = self.function(*args, **keyArgs)
-            timeElapsed = time.time() - startTime
+            timeElapsed = time.monotonic() - startTime
             if timeElapsed >= self.timeout:
                 self.handle_timeout(None, None)
         return result
 
+class Deadline:
+    """
+    A per-move time budget on the monotonic clock, handed to anytime agents
+    (see game.Agent).  The agent polls expired() or remaining() while it
+    searches and stores the best action found so far in bestAction, which
+    the game plays if the agent has to be interrupted.
+    """
+    def __init__(self, seconds):
+        self.start = time.monotonic()
+        self.expiry = self.start + seconds
+        self.bestAction = None
+
+    def remaining(self):
+        return max(0.0, self.expiry - time.monotonic())
+
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def expired(self):
+        return time.monotonic() >= self.expiry
+
 
 
 _ORIGINAL_STDOUT = None
@@ -679,8 +929,114 @@ def unmutePrint():
     sys.stdout = _ORIGINAL_STDOUT
     #sys.stderr = _ORIGINAL_STDERR
 
+class ModuleIndex:
+    """
+    The top-level names of the modules in a directory, read from their
+    sources without executing them, so that import_by_name only has to load
+    the module it needs.  The index is saved in the directory's __pycache__
+    and a module is only parsed again when its modification time changes.
+    """
+    FILENAME = 'moduleIndex.json'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, '__pycache__', ModuleIndex.FILENAME)
+        self.entries = {}
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def refresh(self):
+        """
+        Parses the modules added or changed since the index was built, and
+        drops the removed ones.  Entries follow the order glob lists the
+        modules in, which is the order import_by_name used to try them.
+        """
+        entries = {}
+        changed = False
+        for filename in glob.glob(self.directory + "/*.py"):
+            mtime = os.stat(filename).st_mtime_ns
+            entry = self.entries.get(filename)
+            if entry is None or entry['mtime'] != mtime:
+                defines, imports = ModuleIndex.topLevelNames(filename)
+                entry = {'mtime': mtime, 'defines': defines, 'imports': imports}
+                changed = True
+            entries[filename] = entry
+        changed = changed or entries.keys() != self.entries.keys()
+        self.entries = entries
+        if changed:
+            self.save()
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary = '%s.%d' % (self.path, os.getpid())
+            with open(temporary, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(temporary, self.path)
+        except OSError:
+            pass  # The index is rebuilt by the next process instead
+
+    def find(self, name):
+        """
+        The module to load name from: the first one defining it at the top
+        level, else the first one importing it, else None.
+        """
+        self.refresh()
+        for kind in ('defines', 'imports'):
+            for filename, entry in self.entries.items():
+                if name in entry[kind]:
+                    return filename
+        return None
+
+    def topLevelNames(filename):
+        """
+        (defined, imported) names bound at the top level of a module,
+        including inside top-level if/try/with blocks.  A module that does
+        not parse binds nothing.
+        """
+        try:
+            with open(filename, 'rb') as f:
+                statements = list(ast.parse(f.read(), filename).body)
+        except (SyntaxError, ValueError):
+            return [], []
+
+        defines, imports = set(), set()
+        while statements:
+            node = statements.pop()
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                defines.add(node.name)
+            elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                defines.update(name.id for target in targets for name in ast.walk(target)
+                               if isinstance(name, ast.Name))
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                imports.update((alias.asname or alias.name).split('.')[0] for alias in node.names)
+            elif isinstance(node, (ast.If, ast.Try, ast.With, ast.ExceptHandler)):
+                for field in ('body', 'orelse', 'handlers', 'finalbody'):
+                    statements.extend(getattr(node, field, []))
+        return sorted(defines), sorted(imports)
+    topLevelNames = staticmethod(topLevelNames)
+
+_MODULE_INDEXES = {}
+
 def import_by_name(directory: str, target_name: str):
-    for filename in glob.glob(directory + "/*.py"):
+    """
+    Loads target_name from the module in directory that binds it.  Only the
+    module its ModuleIndex points to is executed; should that module not
+    have the name after all, or no source show it, the others are executed
+    in turn until one does.
+    """
+    if directory not in _MODULE_INDEXES:
+        _MODULE_INDEXES[directory] = ModuleIndex(directory)
+    indexed = _MODULE_INDEXES[directory].find(target_name)
+    filenames = glob.glob(directory + "/*.py")
+    if indexed is not None:
+        filenames = [indexed] + [filename for filename in filenames if filename != indexed]
+
+    for filename in filenames:
         spec = importlib.util.spec_from_file_location(target_name, filename)
         module = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(module)